@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 from src.data_gen import generate_dataset
 from src.model import detect_anomalies
-from src.app_utils import plot_metric, cache_df, export_anomalies_csv
+from src.app_utils import plot_metric, cache_df, export_anomalies
 
 st.set_page_config(page_title="Storable Edge — Anomaly Guard", layout="wide")
 
@@ -30,13 +30,19 @@ df = df[df["facility"].isin(pick_fac)].reset_index(drop=True)
 st.subheader("Sample of data")
 st.dataframe(df.head(10), use_container_width=True)
 
+# Results outlive the run that made them, so the export's "Prepare file" click can use them
+settings = (days, n_fac, seed, metric, tuple(pick_fac), period, if_contam, z_thresh)
 if run_btn:
     with st.spinner("Detecting anomalies..."):
         anomalies, scored = detect_anomalies(df, metric=metric, stl_period=period, iforest_contamination=if_contam, z_abs_threshold=z_thresh)
+    st.session_state.demo_run = (settings, anomalies, scored)
+run = st.session_state.get("demo_run")
+if run and run[0] == settings:
+    _, anomalies, scored = run
     st.success(f"""Found {anomalies.shape[0]} anomalies for **{metric}** across {len(pick_fac)} facilities.""")
     st.plotly_chart(plot_metric(scored, metric, anomalies), use_container_width=True)
     st.markdown("### Anomalies")
     st.dataframe(anomalies, use_container_width=True)
-    export_anomalies_csv(anomalies)
+    export_anomalies(anomalies, version=str(settings))
 else:
     st.info("Set options in the sidebar and click **Run detection**.")
@@ -1,9 +1,12 @@
 # pages/1_👷_Operator_Console.py
 import streamlit as st
 import pandas as pd
-from src.state import ensure_state, run_detection, advance_one_month, _alert_id
+from src.state import (
+    ensure_state, run_detection, advance_one_month, submit_scan, current_scan, scan_schedule, schedule_scans,
+    alert_store,
+)
 from src.ux import (
-    top_bar, friendly_metric, us_date, priority_badge,
+    top_bar, friendly_metric, us_date, us_dates, priority_badge,
     facilities_selector, fmt_money, fmt_percent, render_sidebar_nav,
     section_box, operator_why_sentence,
 )
@@ -16,9 +19,11 @@ render_sidebar_nav()
 # ── Full-screen modal for Task creation (focused action) ──
 def open_task_modal(row, display_val):
     st.session_state["task_modal_data"] = {
-        "id": _alert_id(row),
+        "id": row["alert_id"],
         "facility": row["facility"],
+        "metric_key": row["metric"],
         "metric": friendly_metric(row["metric"]),
+        "day": row["date"],
         "date": us_date(row["date"]),
         "observed": display_val,
         "why": operator_why_sentence(row, row["metric"]),
@@ -48,13 +53,15 @@ def task_modal():
         f"Auto-created from anomaly: {data.get('metric','')} on {data.get('date','')} "
         f"at {data.get('facility','')}.\nObserved: {data.get('observed','')}\n{data.get('why','')}"
     )
-    st.text_area("Description", value=desc_default, height=160, key=f"desc_{data.get('id','')}")
+    desc = st.text_area("Description", value=desc_default, height=160, key=f"desc_{data.get('id','')}")
     cols = st.columns([0.15, 0.85])
     if cols[0].button("Save task", type="primary", key=f"save_{data.get('id','')}"):
+        alert_store().add_task(data["facility"], data["metric_key"], data["day"], title,
+                               assignee=None if assignee == "Unassigned" else assignee, due=due, description=desc)
         st.toast("Task created.", icon="✅")
         st.session_state["task_modal_open"] = False
         st.rerun()
-    cols[1].caption("This is a demo form.")
+    cols[1].caption("Saved to the shared task list.")
 if st.session_state.get("task_modal_open"):
     task_modal()
 
@@ -71,132 +78,210 @@ with st.sidebar:
     st.markdown("#### Demo controls")
     if st.button("▶️ Advance month & scan (demo)", use_container_width=True):
         advance_one_month(seed=7)
-        run_detection(selected_facilities=None, note_scan=True)
-        st.toast("Month advanced → new data scanned.", icon="⏭️")
+        submit_scan(selected_facilities=None, note_scan=True)
+        st.toast("Month advanced → scanning new data in the background.", icon="⏭️")
     if st.button("🔁 Rescan now (demo)", use_container_width=True):
-        run_detection(selected_facilities=None, note_scan=True)
+        submit_scan(selected_facilities=None, note_scan=True)
+    # The schedule is process-wide: show its current interval and change it only on edit
+    sched = scan_schedule()
+    st.number_input("Scheduled scan every (min, 0 = off)", min_value=0, value=int(sched.get("interval_min") or 0),
+                    step=5, key="scan_every_min",
+                    on_change=lambda: schedule_scans(st.session_state.scan_every_min or None))
+    if sched:
+        st.caption(f"Scheduled: {friendly_metric(sched['metric'])} rescan every {sched['interval_min']} min "
+                   "(shared by all users).")
+
+    # Polls only while a scan is running; finishing triggers a full rerun that
+    # picks the results up (ensure_state → poll_scans).
+    def scan_status():
+        job = current_scan()
+        if job is None:
+            return
+        if job.active:
+            st.progress(job.progress, text=f"{job.label}: {job.message or job.status}…")
+        else:
+            st.rerun()
+    st.fragment(scan_status, run_every=1.0 if current_scan() is not None else None)()
+
+METRIC_LABELS = {
+    "billed_revenue": "Billed Revenue",
+    "payment_success_rate": "Payment Success Rate",
+    "move_ins": "Move-ins",
+    "delinquencies": "Delinquencies",
+}
+PAGE_SIZES = [12, 24, 48]
+SORTS = ["Priority", "Newest", "Confidence"]
+
+def first_page():
+    """Back to page 1 of the alert grid (drops the page widget's own value too)."""
+    st.session_state.alert_page = 0
+    st.session_state.pop("alert_page_input", None)
+
+def alert_order() -> str:
+    """Sort order picked in the alert grid (the details table follows it)."""
+    return st.session_state.get("sort_selector", SORTS[0])
+
+# The page is split into fragments: widgets inside one rerun only that fragment.
+# Filters feed every section, so a filter change reruns the whole page; acknowledging
+# a card, sorting or paging reruns only the alert grid (its cards and counts).
 
 # ── Filters (boxed section) ──
-with section_box("Filters"):
-    c1, c2, c3, c4, c5 = st.columns([0.25, 0.22, 0.15, 0.19, 0.19])
-    facilities_all = sorted(st.session_state.df["facility"].unique())
-    with c1:
-        pick_fac = facilities_selector(facilities_all, default=facilities_all[:6])
-    with c2:
-        metric_labels = {
-            "billed_revenue": "Billed Revenue",
-            "payment_success_rate": "Payment Success Rate",
-            "move_ins": "Move-ins",
-            "delinquencies": "Delinquencies",
-        }
-        rev = {v: k for k, v in metric_labels.items()}
-        current_label = metric_labels.get(st.session_state.metric, st.session_state.metric.title())
-        chosen_label = st.selectbox(
-            "Focus Metric",
-            list(metric_labels.values()),
-            index=list(metric_labels.values()).index(current_label),
-            key="focus_metric_selector",
-        )
-        metric = rev[chosen_label]
-        if metric != st.session_state.metric:
-            st.session_state.metric = metric
-            st.session_state.ack = set()
-            run_detection(selected_facilities=pick_fac, note_scan=False)
-    with c3:
-        sort_by = st.selectbox("Sort", ["Priority", "Newest", "Confidence"], key="sort_selector")
-    with c4:
-        date_start = st.date_input("From",
-            value=pd.to_datetime(st.session_state.df["date"]).min().date(), key="date_from")
-    with c5:
-        date_end = st.date_input("To",
-            value=pd.to_datetime(st.session_state.df["date"]).max().date(), key="date_to")
-
-# Seed anomalies (no spam)
-if st.session_state.anomalies.empty:
-    run_detection(selected_facilities=pick_fac, note_scan=False)
-
-# Apply filters
-anom = st.session_state.anomalies.copy()
-if pick_fac:
-    anom = anom[anom["facility"].isin(pick_fac)]
-if 'date_start' in locals():
-    anom = anom[pd.to_datetime(anom["date"]) >= pd.to_datetime(date_start)]
-if 'date_end' in locals():
-    anom = anom[pd.to_datetime(anom["date"]) <= pd.to_datetime(date_end)]
-# Remove acknowledged
-if st.session_state.get("ack"):
-    anom["__id"] = anom.apply(_alert_id, axis=1)
-    anom = anom[~anom["__id"].isin(st.session_state.ack)]
-
-# Sort
-if not anom.empty:
-    if sort_by == "Priority":
-        pr_map = {"High": 3, "Medium": 2, "Low": 1}
-        anom["__prank"] = anom["priority"].map(pr_map)
-        anom = anom.sort_values(["__prank", "priority_score"], ascending=[False, False])
-    elif sort_by == "Newest":
-        anom = anom.sort_values("date", ascending=False)
-    else:
-        anom = anom.sort_values("confidence", ascending=False)
+@st.fragment
+def filters():
+    with section_box("Filters"):
+        c1, c2, c3, c4 = st.columns([0.3, 0.26, 0.22, 0.22])
+        facilities_all = sorted(st.session_state.df["facility"].unique())
+        with c1:
+            pick_fac = facilities_selector(facilities_all, default=facilities_all[:6])
+        with c2:
+            rev = {v: k for k, v in METRIC_LABELS.items()}
+            current_label = METRIC_LABELS.get(st.session_state.metric, st.session_state.metric.title())
+            chosen_label = st.selectbox(
+                "Focus Metric",
+                list(METRIC_LABELS.values()),
+                index=list(METRIC_LABELS.values()).index(current_label),
+                key="focus_metric_selector",
+            )
+            metric = rev[chosen_label]
+            if metric != st.session_state.metric:
+                st.session_state.metric = metric
+                st.session_state.anomalies = st.session_state.anomalies.iloc[0:0]  # old metric's rows no longer apply
+                st.session_state.alert_scan = None
+                submit_scan(selected_facilities=None, note_scan=False)
+        with c3:
+            date_start = st.date_input("From",
+                value=st.session_state.df["date"].min().date(), key="date_from")
+        with c4:
+            date_end = st.date_input("To",
+                value=st.session_state.df["date"].max().date(), key="date_to")
+        show_acked = st.toggle("Show acknowledged", key="show_acked")
+
+    new = dict(facilities=pick_fac, metric=st.session_state.metric,
+               start=date_start, end=date_end, show_acked=show_acked)
+    old = st.session_state.get("console_filters")
+    st.session_state.console_filters = new
+    if old is not None and old != new:
+        first_page()
+        st.rerun()
+filters()
+flt = st.session_state.console_filters
+
+def alert_filter() -> dict:
+    """AlertStore filter arguments for the current filters."""
+    return dict(facilities=flt["facilities"], start=flt["start"], end=flt["end"],
+                acked=None if flt["show_acked"] else False)
+
+# Seed anomalies (no spam); while a background scan runs, show the last completed results
+scanning = current_scan() is not None
+if st.session_state.anomalies.empty and not scanning:
+    run_detection(selected_facilities=flt["facilities"], note_scan=False)
 
 # ── Overview (boxed section) ──
-with section_box("Overview"):
-    k1, k2, k3, k4 = st.columns(4)
-    k1.metric("Facilities in scope", len(sorted(anom["facility"].unique())) if not anom.empty else 0)
-    k2.metric("Alerts shown", anom.shape[0])
-    k3.metric("High priority", int((anom["priority"] == "High").sum()) if not anom.empty else 0)
-    latest_date = pd.to_datetime(st.session_state.df["date"]).max().date()
-    k4.metric("Latest data", latest_date.strftime("%m/%d/%Y"))
-
-# ── Alerts (boxed section) ──
-with section_box(f"Alerts — {friendly_metric(st.session_state.metric)}"):
-    if anom.empty:
-        st.success("No alerts in the selected window. ✅")
-    else:
+@st.fragment
+def overview():
+    with section_box("Overview"):
+        scan = st.session_state.alert_scan
+        counts = alert_store().count(scan, **{**alert_filter(), "acked": None}) if scan else {}
+        k1, k2, k3, k4 = st.columns(4)
+        k1.metric("Facilities in scope", len(flt["facilities"]))
+        k2.metric("Alerts in window", counts.get("total", 0))
+        k3.metric("High priority", counts.get("High", 0))
+        latest_date = st.session_state.df["date"].max().date()
+        k4.metric("Latest data", latest_date.strftime("%m/%d/%Y"))
+overview()
+
+def display_value(val: float) -> str:
+    """Observed value with proper units."""
+    if st.session_state.metric == "billed_revenue":
+        return fmt_money(val)
+    if st.session_state.metric in ("payment_success_rate", "delinquencies"):
+        return fmt_percent(val)
+    return f"{val:,.0f}"
+
+def alert_card(row: pd.Series):
+    alert_id = row["alert_id"]
+    with st.container(border=True):
+        t1, t2 = st.columns([0.65, 0.35])
+        with t1:
+            st.markdown(f"**{row['facility']} • {friendly_metric(row['metric'])}**")
+            st.caption(f"Date: {us_date(row['date'])}")
+        with t2:
+            st.markdown(priority_badge(row["priority"]), unsafe_allow_html=True)
+            st.caption(f"Conf. {int(row['confidence']*100)}%")
+
+        display_val = display_value(row[st.session_state.metric])
+        st.markdown(f"### {display_val}")
+
+        # One-line, operator-friendly reason
+        st.caption(operator_why_sentence(row, st.session_state.metric))
+
+        # Actions: the ack is written in the click callback, then only this grid's fragment reruns
+        b1, b2, b3 = st.columns([0.28, 0.34, 0.38])
+        b1.button("Reopen" if row["acked"] else "Acknowledge", key=f"ack_{alert_id}", use_container_width=True,
+                  on_click=alert_store().acknowledge,
+                  args=(row["facility"], row["metric"], row["date"]), kwargs=dict(on=not row["acked"]))
+        if b2.button("Create Task", key=f"task_{alert_id}", use_container_width=True):
+            open_task_modal(row, display_val); st.rerun()
+        b3.button("Assign to Team", key=f"assign_{alert_id}", use_container_width=True)
+
+# ── Alerts (boxed section): one page of cards per query ──
+@st.fragment
+def alert_grid():
+    scan = st.session_state.alert_scan
+    counts = alert_store().count(scan, **alert_filter()) if scan else {"total": 0}
+    with section_box(f"Alerts — {friendly_metric(st.session_state.metric)}"):
+        if not counts["total"] and scanning:
+            st.info("Scan running in the background — alerts appear when it completes.")
+            return
+        if not counts["total"]:
+            st.success("No alerts in the selected window. ✅")
+            return
+        h1, h2, h3, h4 = st.columns([0.5, 0.18, 0.16, 0.16])
+        h1.markdown(f"**{counts['total']}** {'alerts' if flt['show_acked'] else 'open alerts'} · "
+                    f"{counts['High']} high · {counts['Medium']} medium · {counts['Low']} low")
+        # sort and page size live in this fragment: changing them reruns only the grid
+        h2.selectbox("Sort", SORTS, key="sort_selector", label_visibility="collapsed",
+                     on_change=first_page)
+        size = h3.selectbox("Per page", PAGE_SIZES, key="alert_page_size", label_visibility="collapsed")
+        pages = -(-counts["total"] // size)
+        page = min(st.session_state.get("alert_page", 0), pages - 1)
+        page = h4.number_input("Page", min_value=1, max_value=pages, value=page + 1, step=1,
+                               key="alert_page_input", label_visibility="collapsed") - 1
+        st.session_state.alert_page = page
+        st.caption(f"Page {page + 1} of {pages}")
+
+        rows = alert_store().query(scan, order=alert_order(), limit=size, offset=page * size, **alert_filter())
         cols = st.columns(3)
-        for _, row in anom.head(30).iterrows():
-            alert_id = _alert_id(row)
-            with cols[list(cols).index(cols[0]) if False else (cols.index(cols[0]) if False else 0)]:  # no-op line to avoid linter noise
-                pass
-            with cols[(hash(alert_id) % 3)]:  # spread cards a bit more evenly
-                with st.container(border=True):
-                    t1, t2 = st.columns([0.65, 0.35])
-                    with t1:
-                        st.markdown(f"**{row['facility']} • {friendly_metric(row['metric'])}**")
-                        st.caption(f"Date: {us_date(row['date'])}")
-                    with t2:
-                        st.markdown(priority_badge(row["priority"]), unsafe_allow_html=True)
-                        st.caption(f"Conf. {int(row['confidence']*100)}%")
-
-                    # Observed value with proper units
-                    val = row[st.session_state.metric]
-                    if st.session_state.metric == "billed_revenue":
-                        display_val = fmt_money(val)
-                    elif st.session_state.metric in ("payment_success_rate", "delinquencies"):
-                        display_val = fmt_percent(val)
-                    else:
-                        display_val = f"{val:,.0f}"
-                    st.markdown(f"### {display_val}")
-
-                    # One-line, operator-friendly reason
-                    st.caption(operator_why_sentence(row, st.session_state.metric))
-
-                    # Actions
-                    b1, b2, b3 = st.columns([0.28, 0.34, 0.38])
-                    if b1.button("Acknowledge", key=f"ack_{alert_id}", use_container_width=True):
-                        st.session_state.ack.add(alert_id); st.rerun()
-                    if b2.button("Create Task", key=f"task_{alert_id}", use_container_width=True):
-                        open_task_modal(row, display_val); st.rerun()
-                    b3.button("Assign to Team", key=f"assign_{alert_id}", use_container_width=True)
-
-# Details table
-with st.expander("See all alerts (table)"):
-    table = anom.copy()
-    table["date"] = table["date"].apply(us_date)
-    table.rename(columns={
-        "facility": "Facility",
-        st.session_state.metric: friendly_metric(st.session_state.metric),
-        "priority": "Priority",
-        "confidence": "Confidence",
-    }, inplace=True)
-    st.dataframe(table, use_container_width=True)
+        for i, (_, row) in enumerate(rows.iterrows()):
+            with cols[i % 3]:
+                alert_card(row)
+alert_grid()
+
+# Details table: built only when opened, and reruns on its own
+@st.fragment
+def details_table():
+    with st.expander("See all alerts (table)"):
+        scan = st.session_state.alert_scan
+        if not scan or not st.toggle("Load table", key="details_on"):
+            return
+        table = alert_store().query(scan, order=alert_order(), **alert_filter())
+        table = table.drop(columns=["alert_id", "acked"], errors="ignore")
+        table["date"] = us_dates(table["date"])
+        table.rename(columns={
+            "facility": "Facility",
+            st.session_state.metric: friendly_metric(st.session_state.metric),
+            "priority": "Priority",
+            "confidence": "Confidence",
+        }, inplace=True)
+        st.dataframe(table, use_container_width=True)
+details_table()
+
+# Open tasks (shared across sessions)
+with st.expander("Open tasks"):
+    tasks = alert_store().tasks(metric=st.session_state.metric)
+    if tasks.empty:
+        st.caption("No open tasks for this metric.")
+    else:
+        tasks["date"] = us_dates(pd.to_datetime(tasks["date"]))
+        st.dataframe(tasks[["id", "facility", "date", "title", "assignee", "due", "status"]],
+                     use_container_width=True, hide_index=True)
@@ -2,8 +2,11 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from src.state import ensure_state, run_detection
-from src.ux import top_bar, friendly_metric, us_date, section_box, render_sidebar_nav
+from src.app_utils import export_controls
+from src.charts import portfolio_figure
+from src.export import US_DATE
+from src.state import ensure_state, run_detection, portfolio_rollups, alert_store
+from src.ux import top_bar, friendly_metric, us_dates, section_box, render_sidebar_nav
 
 st.set_page_config(page_title="Storage Anomaly Guard — Executive Dashboard", layout="wide")
 ensure_state()
@@ -15,7 +18,7 @@ top_bar("Executive Dashboard", alerts_count=notif_count)
 # Filters (boxed)
 with section_box("Filters"):
     c1, c2 = st.columns([0.4, 0.6])
-    facilities_all = sorted(st.session_state.df["facility"].unique())
+    facilities_all = list(st.session_state.df["facility"].cat.categories)
     with c1:
         metric = st.selectbox("Portfolio Metric", ["billed_revenue", "payment_success_rate", "move_ins", "delinquencies"])
         if metric != st.session_state.metric:
@@ -23,51 +26,60 @@ with section_box("Filters"):
     with c2:
         pick_fac = st.multiselect("Portfolio Scope", facilities_all, default=facilities_all)
 
-out, scored = run_detection(selected_facilities=pick_fac)
-df = scored.copy()
-df["date"] = pd.to_datetime(df["date"])
-latest = df["date"].max()
+# One full-portfolio scan (cached) feeds the shared rollups; the scope is a read filter
+out, scored = run_detection(selected_facilities=None)
+rollups = portfolio_rollups()
+scope = pick_fac if pick_fac and len(pick_fac) < len(facilities_all) else None
+latest = rollups.latest
+totals = rollups.totals(scope)
 
 # Overview (boxed)
 with section_box("Overview"):
-    alerts_30d = out[out["date"] >= (latest - pd.Timedelta(days=30)).date()]
-    fac_ct = df["facility"].nunique()
-    anom_rate = 0 if df.empty else (len(out) / len(df)) * 100
-    est_savings = max(0, alerts_30d.shape[0] * 250)  # demo heuristic
+    alerts_30d = int(rollups.alerts_by_facility(30, scope)["alerts"].sum())
+    fac_ct = len(scope) if scope else len(facilities_all)
+    anom_rate = 0 if not totals["rows"] else (totals["alerts"] / totals["rows"]) * 100
+    est_savings = max(0, alerts_30d * 250)  # demo heuristic
     k1, k2, k3, k4 = st.columns(4)
     k1.metric("Facilities", fac_ct)
-    k2.metric("30-day Alerts", int(len(alerts_30d)))
+    k2.metric("30-day Alerts", alerts_30d)
     k3.metric("Anomaly Rate", f"{anom_rate:.2f}%")
     k4.metric("Value Protected (30d)", f"${est_savings:,.0f}")
 
 # Trend (boxed)
 with section_box(f"{friendly_metric(st.session_state.metric)} — Portfolio Trend"):
-    fig = px.line(df, x="date", y=st.session_state.metric, color="facility",
-                  title=None)
-    fig.update_layout(xaxis_title="Date", yaxis_title=friendly_metric(st.session_state.metric))
+    df = scored[scored["facility"].isin(scope)] if scope else scored
+    # The chart is downsampled for the selected window: narrow it to see full resolution
+    first, last = rollups.portfolio_daily.index.min().date(), latest.date()
+    window = st.slider("Date range", min_value=first, max_value=last, value=(first, last),
+                       format="MM/DD/YYYY", key="trend_window") if first < last else None
+    fig = portfolio_figure(df, st.session_state.metric, out if not scope else out[out["facility"].isin(scope)],
+                           window=window, label=friendly_metric(st.session_state.metric))
     st.plotly_chart(fig, use_container_width=True)
 
 # Distribution + high priority (boxed)
+since = latest - pd.Timedelta(days=90)
 with section_box("Alerts by Facility (last 90 days)"):
-    recent = out[out["date"] >= (latest - pd.Timedelta(days=90)).date()]
-    if recent.empty:
+    counts = rollups.alerts_by_facility(90, scope)
+    if counts.empty:
         st.info("No recent alerts.")
     else:
-        counts = recent.groupby("facility").size().reset_index(name="alerts")
         bar = px.bar(counts, x="facility", y="alerts", title=None)
         st.plotly_chart(bar, use_container_width=True)
 
-        csv = recent.copy()
-        csv["date"] = csv["date"].apply(us_date)
-        st.download_button("Download Monthly Alert Report (CSV)", csv.to_csv(index=False).encode("utf-8"),
-                           "monthly_alerts.csv", "text/csv")
+        # streamed from the alert store in chunks, written to a temp file on demand
+        scan = st.session_state.alert_scan
+        report = lambda: (c.drop(columns=["alert_id", "acked"]) for c in alert_store().iter_query(
+            scan, facilities=scope, start=since, acked=None, order="Newest"))
+        export_controls(report, "monthly_alerts", key="export_monthly", version=f"{scan}|{scope}|{since}",
+                        date_format=US_DATE, label="Download Monthly Alert Report")
 
 with section_box("High-Priority (last 90 days)"):
-    hp = recent[recent["priority"] == "High"].sort_values("date", ascending=False).head(12) if not recent.empty else pd.DataFrame()
+    hp = alert_store().query(st.session_state.alert_scan, facilities=scope, start=since, acked=None,
+                             order="Newest", priorities=["High"], limit=12)
     if hp.empty:
         st.info("No high-priority alerts in the last 90 days.")
     else:
         hp_disp = hp[["date","facility","metric","priority","confidence"]].copy()
-        hp_disp["date"] = hp_disp["date"].apply(us_date)
+        hp_disp["date"] = us_dates(hp_disp["date"])
         hp_disp["metric"] = hp_disp["metric"].apply(friendly_metric)
         st.dataframe(hp_disp, use_container_width=True)
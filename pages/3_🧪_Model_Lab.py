@@ -1,7 +1,10 @@
 # pages/3_🧪_Model_Lab.py
+import pandas as pd
 import streamlit as st
-from src.state import ensure_state, run_detection
-from src.app_utils import plot_metric, export_anomalies_csv
+from src.state import ensure_state, run_detection, result_cache, configure_result_cache, run_sweep
+from src.model import DECOMPOSITIONS, EXECUTORS
+from src.profiling import structured_logs
+from src.app_utils import plot_metric, export_anomalies, export_controls
 from src.ux import top_bar, friendly_metric, section_box, render_sidebar_nav  # minimal imports (avoid cycles)
 
 st.set_page_config(page_title="Storage Anomaly Guard — Model Lab", layout="wide")
@@ -21,25 +24,147 @@ with section_box("Parameters"):
         st.session_state.metric = metric
     st.session_state.params["stl_period"] = st.number_input(
         "STL period (season length)", value=st.session_state.params["stl_period"], step=1)
+    st.session_state.params["decomposition"] = st.selectbox(
+        "Decomposition", DECOMPOSITIONS,
+        index=DECOMPOSITIONS.index(st.session_state.params.get("decomposition", "stl")),
+        help="stl: robust STL per facility (most accurate). classical / median: batched "
+             "moving-average or moving-median decomposition, much faster on large portfolios.")
     st.session_state.params["iforest_contamination"] = st.slider(
         "IsolationForest contamination (%)", 0.1, 10.0,
         float(st.session_state.params["iforest_contamination"]*100)) / 100.0
     st.session_state.params["z_abs_threshold"] = st.slider(
         "|Z| threshold (aux filter)", 1.0, 5.0, float(st.session_state.params["z_abs_threshold"]), step=0.1)
+    c1, c2 = st.columns(2)
+    st.session_state.params["cascade"] = c1.checkbox(
+        "Cascade triage", value=bool(st.session_state.params.get("cascade", False)),
+        help="Screen raw levels first; only facilities above the triage |Z| get the full model.")
+    st.session_state.params["triage_z"] = c2.slider(
+        "Triage |Z|", 2.0, 8.0, float(st.session_state.params.get("triage_z", 4.5)), step=0.1,
+        disabled=not st.session_state.params["cascade"])
+    e1, e2 = st.columns(2)
+    st.session_state.params["executor"] = e1.selectbox(
+        "Execution", EXECUTORS, index=EXECUTORS.index(st.session_state.params.get("executor", "serial")),
+        help="Spread facilities across a thread or process pool.")
+    st.session_state.params["n_workers"] = int(e2.number_input(
+        "Workers (0 = all cores)", min_value=0, value=int(st.session_state.params.get("n_workers") or 0), step=1)) or None
+    st.session_state.params["incremental"] = st.checkbox(
+        "Incremental scans", value=bool(st.session_state.params.get("incremental", False)),
+        help="Score only newly appended days for all facilities; forests refit every 90 days.")
+    st.session_state.params["pooled"] = st.checkbox(
+        "Pooled portfolio model", value=bool(st.session_state.params.get("pooled", False)),
+        help="One IsolationForest over every selected facility's normalized features instead of "
+             "one per facility; thresholds and confidence stay per facility.")
+    st.session_state.params["reuse_models"] = st.checkbox(
+        "Reuse saved models", value=bool(st.session_state.params.get("reuse_models", True)),
+        help="Load fitted forests from disk; refit only when a model is older than 30 days or the data drifts.")
+    perf_logs = st.checkbox("Structured timing logs", value=bool(st.session_state.get("perf_logs")),
+                            help="One JSON line per stage and per scan on the server's stderr.")
+    if perf_logs != bool(st.session_state.get("perf_logs")):
+        st.session_state["perf_logs"] = perf_logs
+        structured_logs(perf_logs)
     run_btn = st.button("Run detection")
 
 # Data sample (boxed)
 with section_box("Data sample"):
     st.dataframe(st.session_state.df.head(10), use_container_width=True)
 
-# Results (boxed)
+# Results (boxed) — after the first run, knob changes rescore live; model stages
+# are cached, so threshold moves only relabel.
 if run_btn:
-    anomalies, scored = run_detection(selected_facilities=pick_fac)
+    st.session_state["lab_live"] = True
+if st.session_state.get("lab_live"):
+    anomalies, scored = run_detection(selected_facilities=pick_fac, note_scan=run_btn)
     with section_box(f"Results — {friendly_metric(st.session_state.metric)}"):
         st.success(f"Found {anomalies.shape[0]} anomalies.")
+        cascade = st.session_state.last_run.get("stats", {})
+        if "full_model" in cascade:
+            st.caption(f"Cascade: {cascade['facilities']} facilities screened → "
+                       f"{cascade['full_model']} full model · {cascade['clean']} cleared by triage")
+        cs = result_cache().stats()
+        st.caption(f"Result cache: {cs['hits']} hits / {cs['misses']} misses · "
+                   f"{cs['entries']} entries · {cs['bytes'] / 2**20:.1f} MB")
+        with st.expander("Result cache limits (shared by all sessions)"):
+            # applied only when changed, so opening the page never resets another session's limits
+            rc = result_cache()
+            l1, l2 = st.columns(2)
+            l1.number_input("Max entries", min_value=1, value=rc.max_entries, step=8, key="rc_entries",
+                            on_change=lambda: configure_result_cache(max_entries=st.session_state.rc_entries))
+            l2.number_input("Max MB", min_value=16, value=int(rc.max_bytes / 2**20), step=64, key="rc_mb",
+                            on_change=lambda: configure_result_cache(max_mb=st.session_state.rc_mb))
         st.plotly_chart(plot_metric(scored, st.session_state.metric, anomalies), use_container_width=True)
         st.markdown("### Anomalies")
         st.dataframe(anomalies, use_container_width=True)
-        export_anomalies_csv(anomalies)
+        export_anomalies(anomalies, version=st.session_state.alert_scan)
+        with st.expander("Export scored data"):
+            st.caption(f"{len(scored):,} scored rows · written in chunks, CSV or Parquet")
+            export_controls(scored, "scored", key="export_scored", version=st.session_state.alert_scan,
+                            choose_columns=True, label="Download scored data")
+
+    # Performance (boxed) — profile of the scan that produced these results
+    prof = st.session_state.last_run.get("stats", {}).get("profile")
+    if prof:
+        with section_box("Performance — last run"):
+            stats = st.session_state.last_run["stats"]
+            counters = prof["counters"]
+            p1, p2, p3, p4 = st.columns(4)
+            p1.metric("Scan time", f"{prof['wall_s']:.2f} s")
+            p2.metric("Rows scored", f"{counters.get('rows', 0):,}")
+            p3.metric("Forests fit / registry lookups",
+                      f"{counters.get('forest_fits', 0)} / {counters.get('registry_lookups', 0)}")
+            p4.metric("Stage cache hits", sum(v for k, v in counters.items() if k.endswith("_cache_hits")))
+            if stats.get("result_cache") == "hit":
+                st.caption("Served from the result cache — timings are from the scan that computed it.")
+            s1, s2 = st.columns(2)
+            with s1:
+                st.markdown("**Stage breakdown (s)**")
+                stages = pd.Series(prof["stages"], name="seconds").sort_values(ascending=False)
+                st.bar_chart(stages, horizontal=True)
+            with s2:
+                st.markdown("**Slowest facilities**")
+                st.dataframe(pd.DataFrame(prof["slowest_facilities"]), use_container_width=True, hide_index=True)
+            with st.expander("Counters"):
+                st.json(counters)
 else:
     st.info("Set parameters and click **Run detection**.")
+
+# Parameter sweep (boxed) — one model pass per STL period; contamination and |Z|
+# only relabel that pass's scores.
+with section_box("Parameter sweep"):
+    w1, w2, w3 = st.columns(3)
+    periods = w1.multiselect("STL periods", [5, 7, 14, 28], default=[7])
+    contaminations = w2.multiselect("IF contamination (%)", [0.5, 1.0, 1.5, 2.0, 3.0, 5.0],
+                                    default=[0.5, 1.0, 1.5, 2.0, 3.0])
+    z_grid = w3.multiselect("|Z| thresholds", [2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0],
+                            default=[2.5, 3.0, 3.5, 4.0, 4.5])
+    n_points = len(periods) * len(contaminations) * len(z_grid)
+    st.caption(f"{n_points} settings · {len(periods)} model pass(es) on "
+               f"{len(pick_fac) if pick_fac else 'all'} facilities, {friendly_metric(st.session_state.metric)}")
+    if st.button("Run sweep", disabled=not n_points):
+        bar = st.progress(0.0, text="Sweeping…")
+        st.session_state["sweep"] = run_sweep(
+            pick_fac, periods, [c / 100.0 for c in contaminations], z_grid,
+            progress=lambda f, msg: bar.progress(f, text=msg))
+        bar.empty()
+    table = st.session_state.get("sweep")
+    if table is not None and not table.empty:
+        has_truth = table["f1"].notna().any()
+        ranked = table.sort_values(["f1", "alerts"] if has_truth else ["alerts"],
+                                   ascending=[False, True] if has_truth else [True])
+        if has_truth:
+            best = ranked.iloc[0]
+            st.success(f"Best F1 {best['f1']:.2f} (precision {best['precision']:.0%}, recall {best['recall']:.0%}) "
+                       f"at period {int(best['stl_period'])}, contamination {best['contamination']:.1%}, "
+                       f"|Z| {best['z_abs_threshold']:.1f}.")
+            if st.button("Use best setting"):
+                st.session_state.params.update(stl_period=int(best["stl_period"]),
+                                               iforest_contamination=float(best["contamination"]),
+                                               z_abs_threshold=float(best["z_abs_threshold"]))
+                st.rerun()
+        else:
+            st.caption("No ground-truth column in this dataset: alert counts only.")
+        st.dataframe(ranked, use_container_width=True, hide_index=True, column_config={
+            "contamination": st.column_config.NumberColumn(format="%.3f"),
+            "precision": st.column_config.NumberColumn(format="%.2f"),
+            "recall": st.column_config.NumberColumn(format="%.2f"),
+            "f1": st.column_config.NumberColumn(format="%.2f"),
+        })
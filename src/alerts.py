@@ -0,0 +1,224 @@
+# src/alerts.py
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+
+from .cache import fingerprint_frame
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    scan TEXT PRIMARY KEY, metric TEXT NOT NULL, rows INTEGER NOT NULL, created_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS alerts (
+    scan TEXT NOT NULL, metric TEXT NOT NULL, facility TEXT NOT NULL, date TEXT NOT NULL,
+    value REAL, residual REAL, rolling_z REAL, iso_decision REAL, priority TEXT,
+    priority_score REAL, confidence REAL, why_text TEXT,
+    PRIMARY KEY (scan, metric, facility, date)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS alerts_by_date ON alerts (scan, metric, date);
+CREATE TABLE IF NOT EXISTS acks (
+    facility TEXT NOT NULL, metric TEXT NOT NULL, date TEXT NOT NULL, acked_at REAL NOT NULL,
+    PRIMARY KEY (facility, metric, date)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY, facility TEXT NOT NULL, metric TEXT NOT NULL, date TEXT NOT NULL,
+    title TEXT NOT NULL, assignee TEXT, due TEXT, description TEXT,
+    status TEXT NOT NULL DEFAULT 'open', created_at REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS tasks_by_alert ON tasks (facility, metric, date);
+"""
+
+# SQL for the Operator Console sort options
+ORDERS = {
+    "Priority": "CASE a.priority WHEN 'High' THEN 3 WHEN 'Medium' THEN 2 ELSE 1 END DESC, a.priority_score DESC",
+    "Newest": "a.date DESC",
+    "Confidence": "a.confidence DESC",
+}
+
+# dates are stored as fixed-width text, so they sort and compare chronologically
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _day(value) -> str:
+    return pd.Timestamp(value).strftime(DATE_FORMAT)
+
+class AlertStore:
+    """Alerts, acknowledgements and operator tasks in one local SQLite file (WAL mode).
+
+    A scan's anomalies are stored once under a content hash of the table (`publish`),
+    so every session showing the same results shares one copy. Acks and tasks are keyed
+    by (facility, metric, date) and outlive scans, metric switches and sessions.
+    `query` filters by scan, facility, date window and ack status in SQL, on indexes.
+    Only the <keep_scans> most recently used scans are kept: publishing or reading a
+    scan refreshes it (scans.created_at holds the last use). Reading a scan that has
+    been pruned returns no rows; callers re-publish it (see state.ensure_state).
+    """
+
+    TOUCH_EVERY_S = 30.0  # reads refresh a scan's last use at most this often
+
+    def __init__(self, path: str | os.PathLike = ".data/alerts.sqlite", keep_scans: int = 50):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.keep_scans = keep_scans
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread; WAL lets readers run alongside the single writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _tx(self) -> Iterator[sqlite3.Connection]:
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def publish(self, anomalies: pd.DataFrame, metric: str) -> str:
+        """Store a scan's anomalies table (one metric's columns) and return its scan id."""
+        scan = fingerprint_frame(anomalies)
+        if self.touch(scan, every=0.0):
+            return scan
+        rows = pd.DataFrame(dict(
+            scan=scan, metric=metric, facility=anomalies["facility"].astype(str),
+            date=pd.to_datetime(anomalies["date"]).dt.strftime(DATE_FORMAT),
+            value=anomalies[metric].astype(float), residual=anomalies[f"{metric}_residual"].astype(float),
+            rolling_z=anomalies["rolling_z"], iso_decision=anomalies["iso_decision"],
+            priority=anomalies["priority"].astype(str), priority_score=anomalies["priority_score"],
+            confidence=anomalies["confidence"], why_text=anomalies["why_text"].astype(str)))
+        with self._tx() as db:
+            db.execute("INSERT OR IGNORE INTO scans VALUES (?, ?, ?, ?)", (scan, metric, len(rows), time.time()))
+            db.executemany("INSERT OR IGNORE INTO alerts VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                           rows.astype(object).where(rows.notna(), None).itertuples(index=False, name=None))
+            old = [r[0] for r in db.execute("SELECT scan FROM scans ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+                                            (self.keep_scans,))]
+            db.executemany("DELETE FROM alerts WHERE scan = ?", [(s,) for s in old])
+            db.executemany("DELETE FROM scans WHERE scan = ?", [(s,) for s in old])
+        return scan
+
+    def touch(self, scan: str, every: float | None = None) -> bool:
+        """Mark <scan> as used now (if its last use is older than <every> s); False if unknown."""
+        every = self.TOUCH_EVERY_S if every is None else every
+        now = time.time()
+        db = self._conn()
+        db.execute("UPDATE scans SET created_at = ? WHERE scan = ? AND created_at < ?", (now, scan, now - every))
+        return db.execute("SELECT 1 FROM scans WHERE scan = ?", (scan,)).fetchone() is not None
+
+    @staticmethod
+    def _where(scan: str, facilities=None, start=None, end=None, acked: bool | None = False,
+               priorities: list[str] | None = None) -> tuple[list[str], list]:
+        sql = ["FROM alerts a LEFT JOIN acks k",
+               "ON k.facility = a.facility AND k.metric = a.metric AND k.date = a.date",
+               "WHERE a.scan = ?"]
+        args: list = [scan]
+        if facilities:
+            sql.append(f"AND a.facility IN ({','.join('?' * len(facilities))})")
+            args += [str(f) for f in facilities]
+        if start is not None:
+            sql.append("AND a.date >= ?"); args.append(_day(start))
+        if end is not None:
+            sql.append("AND a.date <= ?"); args.append(_day(end))
+        if priorities:
+            sql.append(f"AND a.priority IN ({','.join('?' * len(priorities))})")
+            args += list(priorities)
+        if acked is not None:
+            sql.append("AND k.acked_at IS NOT NULL" if acked else "AND k.acked_at IS NULL")
+        return sql, args
+
+    def _select(self, scan: str, facilities=None, start=None, end=None, acked: bool | None = False,
+                order: str = "Priority", limit: int | None = None, priorities: list[str] | None = None,
+                offset: int = 0) -> tuple[str, list]:
+        where, args = self._where(scan, facilities, start, end, acked, priorities)
+        sql = ["SELECT a.*, k.acked_at IS NOT NULL AS acked"] + where
+        sql.append(f"ORDER BY {ORDERS[order]}, a.date, a.facility")
+        if limit is not None or offset:
+            sql.append("LIMIT ? OFFSET ?"); args += [-1 if limit is None else int(limit), int(offset)]
+        return " ".join(sql), args
+
+    @staticmethod
+    def _frame(df: pd.DataFrame, metric: str | None) -> pd.DataFrame:
+        df["alert_id"] = df["facility"] + "|" + df["metric"] + "|" + df["date"]
+        df["date"] = pd.to_datetime(df["date"], format=DATE_FORMAT)
+        df["acked"] = df["acked"].astype(bool)
+        df = df.drop(columns="scan")
+        return df if metric is None else df.rename(columns={"value": metric, "residual": f"{metric}_residual"})
+
+    def query(self, scan: str, facilities: list[str] | None = None, start=None, end=None,
+              acked: bool | None = False, order: str = "Priority", limit: int | None = None,
+              priorities: list[str] | None = None, offset: int = 0) -> pd.DataFrame:
+        """A scan's alerts in the anomalies-table layout (plus alert_id and acked).
+
+        <acked>: False hides acknowledged alerts, True returns only those, None both.
+        <limit>/<offset> page through the sorted result.
+        """
+        metric = self._metric(scan)
+        sql, args = self._select(scan, facilities, start, end, acked, order, limit, priorities, offset)
+        return self._frame(pd.read_sql_query(sql, self._conn(), params=args), metric)
+
+    def iter_query(self, scan: str, chunk_rows: int = 50_000, **filters) -> Iterator[pd.DataFrame]:
+        """`query` as a stream of frames of <= chunk_rows rows, for exports."""
+        metric = self._metric(scan)
+        sql, args = self._select(scan, **filters)
+        for chunk in pd.read_sql_query(sql, self._conn(), params=args, chunksize=chunk_rows):
+            yield self._frame(chunk, metric)
+
+    def count(self, scan: str, facilities: list[str] | None = None, start=None, end=None,
+              acked: bool | None = False) -> dict[str, int]:
+        """Alerts matching the filters, by priority (plus "total"); same filters as `query`."""
+        self.touch(scan)
+        where, args = self._where(scan, facilities, start, end, acked)
+        rows = self._conn().execute(" ".join(["SELECT a.priority, COUNT(*)"] + where + ["GROUP BY a.priority"]),
+                                    args).fetchall()
+        counts = {p: 0 for p in ("High", "Medium", "Low")}
+        counts.update(dict(rows))
+        counts["total"] = sum(n for _, n in rows)
+        return counts
+
+    def _metric(self, scan: str) -> str | None:
+        # also counts as a use of the scan; None once it has been pruned
+        self.touch(scan)
+        row = self._conn().execute("SELECT metric FROM scans WHERE scan = ?", (scan,)).fetchone()
+        return None if row is None else row[0]
+
+    def acknowledge(self, facility: str, metric: str, date, on: bool = True):
+        with self._tx() as db:
+            if on:
+                db.execute("INSERT OR IGNORE INTO acks VALUES (?, ?, ?, ?)",
+                           (str(facility), metric, _day(date), time.time()))
+            else:
+                db.execute("DELETE FROM acks WHERE facility = ? AND metric = ? AND date = ?",
+                           (str(facility), metric, _day(date)))
+
+    def add_task(self, facility: str, metric: str, date, title: str, assignee: str | None = None,
+                 due=None, description: str = "") -> int:
+        with self._tx() as db:
+            cur = db.execute(
+                "INSERT INTO tasks (facility, metric, date, title, assignee, due, description, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(facility), metric, _day(date), title, assignee,
+                 None if due is None else str(pd.Timestamp(due).date()), description, time.time()))
+            return int(cur.lastrowid)
+
+    def tasks(self, facility: str | None = None, metric: str | None = None, status: str | None = "open") -> pd.DataFrame:
+        sql, args = ["SELECT * FROM tasks WHERE 1 = 1"], []
+        for col, val in (("facility", facility), ("metric", metric), ("status", status)):
+            if val is not None:
+                sql.append(f"AND {col} = ?"); args.append(str(val))
+        sql.append("ORDER BY created_at DESC")
+        return pd.read_sql_query(" ".join(sql), self._conn(), params=args)
+
+    def set_task_status(self, task_id: int, status: str):
+        with self._tx() as db:
+            db.execute("UPDATE tasks SET status = ? WHERE id = ?", (status, int(task_id)))
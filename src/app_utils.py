@@ -1,28 +1,53 @@
 # src/app_utils.py
+from pathlib import Path
+from typing import Callable, Iterable
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
+from .charts import portfolio_figure
+from .export import FORMATS, export_file
 
 @st.cache_data(show_spinner=False)
 def cache_df(_fn, **kwargs):  # underscore = do not hash callable
     return _fn(**kwargs)
 
-def plot_metric(scored: pd.DataFrame, metric: str, anomalies: pd.DataFrame):
-    fig = go.Figure()
-    for fac, sub in scored.groupby("facility"):
-        fig.add_trace(go.Scatter(x=sub["date"], y=sub[metric], mode="lines", name=f"{fac}"))
-    if not anomalies.empty:
-        fig.add_trace(go.Scatter(
-            x=anomalies["date"], y=anomalies[metric], mode="markers", name="anomaly",
-            marker=dict(size=10, symbol="x")))
-    fig.update_layout(
-        title=f"{metric} with flagged anomalies",
-        xaxis_title="Date", yaxis_title=metric, legend_title="Facility")
+def plot_metric(scored: pd.DataFrame, metric: str, anomalies: pd.DataFrame, window: tuple | None = None):
+    # downsampled / WebGL / percentile bands as the portfolio grows (see charts.py)
+    fig = portfolio_figure(scored, metric, anomalies, window=window)
+    fig.update_layout(title=f"{metric} with flagged anomalies")
     return fig
 
-def export_anomalies_csv(anomalies: pd.DataFrame):
+def download_file(path: Path, label: str, file_name: str, key: str | None = None):
+    # the button reads the open file: no formatted frame or CSV string is built on the way
+    with open(path, "rb") as f:
+        st.download_button(label, f, file_name=f"{file_name}{path.suffix}", mime=FORMATS[path.suffix[1:]], key=key)
+
+def export_controls(source: pd.DataFrame | Callable[[], Iterable[pd.DataFrame]], name: str, key: str,
+                    version: str | None = None, columns: list[str] | None = None,
+                    choose_columns: bool = False, date_format: str | None = None, label: str = "Download"):
+    """Format (and column) pickers plus a "Prepare file" button; the file is only written on click.
+
+    <source> is a frame or a callable yielding frames (e.g. `AlertStore.iter_query`).
+    A prepared file is offered until <version>, the format or the columns change.
+    """
+    c1, c2 = st.columns([0.25, 0.75])
+    fmt = c1.selectbox("Format", list(FORMATS), key=f"{key}_fmt", format_func=str.upper)
+    if choose_columns and isinstance(source, pd.DataFrame):
+        columns = c2.multiselect("Columns", list(source.columns), default=columns or list(source.columns),
+                                 key=f"{key}_cols")
+        if not columns:
+            st.caption("Pick at least one column to export.")
+            return
+    settings = (version, fmt, tuple(columns or ()))
+    if st.button("Prepare file", key=f"{key}_prepare"):
+        frames = source if isinstance(source, pd.DataFrame) else source()
+        st.session_state[key] = (settings, export_file(frames, fmt, columns=columns, date_format=date_format))
+    prepared = st.session_state.get(key)
+    if prepared and prepared[0] == settings and prepared[1].exists():
+        download_file(prepared[1], f"{label} ({fmt.upper()})", name, key=f"{key}_download")
+
+def export_anomalies(anomalies: pd.DataFrame, version: str | None, key: str = "export_anomalies"):
+    """`export_controls` for an anomalies table; nothing is written until "Prepare file"."""
     if anomalies.empty:
         st.info("No anomalies to export.")
         return
-    csv = anomalies.to_csv(index=False).encode("utf-8")
-    st.download_button("Download anomalies CSV", csv, file_name="anomalies.csv", mime="text/csv")
+    export_controls(anomalies, "anomalies", key=key, version=version, label="Download anomalies")
@@ -0,0 +1,163 @@
+# src/batch.py
+"""Headless batch scoring for nightly jobs.
+
+    python -m src.batch portfolio.parquet anomalies.csv --metrics billed_revenue move_ins
+    python -m src.batch data.csv anomalies.parquet --scored-out scored.parquet --chunk-facilities 250
+
+Input (CSV or Parquet) is read in record batches and regrouped into chunks of whole
+facilities, so rows of one facility must be contiguous (any row order within a facility).
+Each chunk is scored with `detect_anomalies_multi` and its anomalies (and optionally every
+scored row) are appended to the output straight away: memory is bounded by one chunk,
+whatever the input size. A throughput summary is printed at the end.
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .export import Sink, is_parquet
+from .model import DECOMPOSITIONS, EXECUTORS, FRIENDLY, TRIAGE_RZ, detect_anomalies_multi
+from .profiling import PeakRSS, profiling, structured_logs
+from .registry import ModelRegistry
+from .schema import REQUIRED_COLUMNS, coerce_dataset
+
+def read_batches(path: str | Path, batch_rows: int = 200_000) -> Iterator[pd.DataFrame]:
+    """Stream the required columns of a CSV/Parquet file as DataFrames of <= batch_rows rows."""
+    if is_parquet(path):
+        pf = pq.ParquetFile(path)
+        columns = [c for c in REQUIRED_COLUMNS if c in pf.schema_arrow.names]
+        for batch in pf.iter_batches(batch_size=batch_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=batch_rows, usecols=lambda c: c in REQUIRED_COLUMNS)
+
+def facility_chunks(frames: Iterable[pd.DataFrame], chunk_facilities: int = 500) -> Iterator[pd.DataFrame]:
+    """Regroup a stream of row batches into frames holding <chunk_facilities> whole facilities."""
+    done: set[str] = set()
+    buf = None
+    for frame in frames:
+        buf = frame if buf is None else pd.concat([buf, frame], ignore_index=True)
+        fac = buf["facility"].astype(str).to_numpy()
+        starts = np.flatnonzero(np.r_[True, fac[1:] != fac[:-1]])
+        runs = fac[starts]
+        if len(set(runs)) != len(runs) or not done.isdisjoint(runs):
+            raise ValueError("input rows must be grouped by facility; sort the file by facility first")
+        # every facility but the last in the buffer is complete
+        while len(starts) > chunk_facilities:
+            cut = starts[chunk_facilities]
+            done.update(runs[:chunk_facilities])
+            yield buf.iloc[:cut]
+            buf, runs, starts = buf.iloc[cut:].reset_index(drop=True), runs[chunk_facilities:], starts[chunk_facilities:] - cut
+    if buf is not None and len(buf):
+        yield buf
+
+def _with_metric(scored: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    return pd.concat([s.assign(metric=m) for m, s in scored.items()], ignore_index=True)
+
+def score_file(src: str | Path, out: str | Path, metrics: list[str] | None = None,
+               scored_out: str | Path | None = None, chunk_facilities: int = 500,
+               batch_rows: int = 200_000, stl_period: int = 7, iforest_contamination: float = 0.015,
+               z_abs_threshold: float = 3.0, multivariate: bool = False, decomposition: str = "stl",
+               cascade: bool = False, triage_z: float = 4.5, triage_rz: float = TRIAGE_RZ, pooled: bool = False,
+               executor: str = "serial", n_workers: int | None = None, model_dir: str | None = None,
+               progress: Callable[[dict], None] | None = None) -> dict:
+    """Score <src> chunk by chunk, streaming anomalies to <out>; returns the run summary."""
+    metrics = list(metrics or ["billed_revenue"])
+    registry = ModelRegistry(model_dir) if model_dir else None
+    sinks = [Sink(out)] + ([Sink(scored_out)] if scored_out else [])
+    stats = dict(chunks=0, facilities=0, rows=0, anomalies=0)
+    if cascade:
+        stats.update(full_model=0, clean=0)
+    t0 = time.perf_counter()
+    try:
+        with PeakRSS() as mem, profiling("batch") as prof:
+            for chunk in facility_chunks(read_batches(src, batch_rows), chunk_facilities):
+                chunk = coerce_dataset(chunk)
+                triage = {}
+                # cache=False: a one-shot pass gains nothing from the stage cache but its memory
+                anomalies, scored = detect_anomalies_multi(
+                    chunk, metrics, stl_period=stl_period, iforest_contamination=iforest_contamination,
+                    z_abs_threshold=z_abs_threshold, multivariate=multivariate,
+                    decomposition=decomposition, registry=registry, cascade=cascade, triage_z=triage_z,
+                    triage_rz=triage_rz, stats=triage, pooled=pooled, executor=executor, n_workers=n_workers, cache=False)
+                sinks[0].write(anomalies)
+                if scored_out:
+                    sinks[1].write(_with_metric(scored))
+                stats["chunks"] += 1
+                stats["facilities"] += chunk["facility"].nunique()
+                stats["rows"] += len(chunk)
+                stats["anomalies"] += len(anomalies)
+                for k in ("full_model", "clean"):
+                    if k in triage:
+                        stats[k] += triage[k]
+                if progress:
+                    elapsed = time.perf_counter() - t0
+                    progress(dict(stats, elapsed_s=round(elapsed, 2),
+                                  rows_per_s=round(stats["rows"] / elapsed, 1) if elapsed else None))
+    finally:
+        for sink in sinks:
+            sink.close()
+    elapsed = time.perf_counter() - t0
+    return dict(stats, metrics=metrics, elapsed_s=round(elapsed, 3),
+                rows_per_s=round(stats["rows"] / elapsed, 1) if elapsed else None,
+                peak_mem_mb=round(mem.delta_mb, 2), profile=prof.to_dict(), output=str(out),
+                scored_output=str(scored_out) if scored_out else None)
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("input", help="CSV or Parquet facility data")
+    ap.add_argument("output", help="anomalies file (.csv or .parquet)")
+    ap.add_argument("--metrics", nargs="+", choices=list(FRIENDLY), default=["billed_revenue"])
+    ap.add_argument("--scored-out", help="also write every scored row here")
+    ap.add_argument("--chunk-facilities", type=int, default=500)
+    ap.add_argument("--batch-rows", type=int, default=200_000)
+    ap.add_argument("--stl-period", type=int, default=7)
+    ap.add_argument("--contamination", type=float, default=0.015)
+    ap.add_argument("--z", type=float, default=3.0, help="|rolling z| threshold")
+    ap.add_argument("--multivariate", action="store_true")
+    ap.add_argument("--decomposition", choices=DECOMPOSITIONS, default="stl")
+    ap.add_argument("--cascade", action="store_true", help="full model only on facilities the triage flags")
+    ap.add_argument("--triage-z", type=float, default=4.5, help="cascade: robust (MAD) |z| threshold")
+    ap.add_argument("--triage-rz", type=float, default=TRIAGE_RZ, help="cascade: rolling |z| threshold")
+    ap.add_argument("--pooled", action="store_true", help="one forest per chunk instead of per facility")
+    ap.add_argument("--executor", choices=EXECUTORS, default="serial")
+    ap.add_argument("--workers", type=int)
+    ap.add_argument("--model-dir", help="reuse/save fitted forests in this registry")
+    ap.add_argument("--summary-json", help="write the run summary here")
+    ap.add_argument("--quiet", action="store_true", help="no per-chunk progress lines")
+    ap.add_argument("--perf-log", action="store_true", help="structured JSON timing lines on stderr")
+    args = ap.parse_args(argv)
+    if args.perf_log:
+        structured_logs()
+
+    def report(p: dict):
+        print(f"chunk {p['chunks']:>4}: {p['facilities']:>8,} facilities {p['rows']:>12,} rows "
+              f"{p['anomalies']:>8,} anomalies {p['rows_per_s'] or 0:>10,.0f} rows/s", file=sys.stderr, flush=True)
+
+    summary = score_file(
+        args.input, args.output, args.metrics, scored_out=args.scored_out,
+        chunk_facilities=args.chunk_facilities, batch_rows=args.batch_rows, stl_period=args.stl_period,
+        iforest_contamination=args.contamination, z_abs_threshold=args.z, multivariate=args.multivariate,
+        decomposition=args.decomposition, cascade=args.cascade, triage_z=args.triage_z,
+        triage_rz=args.triage_rz, pooled=args.pooled, executor=args.executor, n_workers=args.workers, model_dir=args.model_dir,
+        progress=None if args.quiet else report)
+    print(f"scored {summary['rows']:,} rows / {summary['facilities']:,} facilities in {summary['chunks']} chunks: "
+          f"{summary['anomalies']:,} anomalies, {summary['elapsed_s']:.1f}s, {summary['rows_per_s'] or 0:,.0f} rows/s, "
+          f"peak +{summary['peak_mem_mb']:.0f} MB")
+    stages = summary["profile"]["stages"]
+    print("stages: " + ", ".join(f"{k} {v:.1f}s" for k, v in sorted(stages.items(), key=lambda kv: -kv[1])))
+    if args.cascade:
+        print(f"cascade: {summary['full_model']:,} facilities fully scored, {summary['clean']:,} cleared by triage")
+    if args.summary_json:
+        Path(args.summary_json).write_text(json.dumps(summary, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# src/bench.py
+"""Scalability benchmarks for the detection pipeline.
+
+    python -m src.bench --preset quick --out bench_results.json
+    python -m src.bench --facilities 12 100 --days 90 365 --compare bench_baseline.json
+    python -m src.bench --facilities 1000 --days 365 --decompositions stl classical median
+
+Each case runs one uncached end-to-end `detect_anomalies` under `profiling()`, recording
+wall time, the pipeline's own per-stage self-times (prepare, decomposition, rolling_z,
+forest, explanations, scoring), peak resident memory above the pre-run level (sampled
+from /proc; lifetime max RSS elsewhere) and rows/sec. `--compare` flags cases slower
+than the baseline by more than `--tolerance` and exits non-zero when any regress.
+"""
+from __future__ import annotations
+import argparse
+import json
+import platform
+import sys
+import time
+from itertools import product
+from pathlib import Path
+
+from .data_gen import generate_dataset
+from .model import DECOMPOSITIONS, FRIENDLY, detect_anomalies
+from .profiling import PeakRSS, profiling
+
+PRESETS = {
+    "quick": dict(facilities=[12, 100], days=[90, 365], metrics=["billed_revenue"]),
+    "full": dict(facilities=[12, 100, 1000, 10000], days=[90, 365, 1095], metrics=list(FRIENDLY)),
+}
+
+def run_case(n_facilities: int, days: int, metric: str, seed: int = 42, decomposition: str = "stl") -> dict:
+    df = generate_dataset(days=days, n_facilities=n_facilities, seed=seed)
+    with PeakRSS() as mem, profiling("bench") as prof:
+        t0 = time.perf_counter()
+        out, _ = detect_anomalies(df, metric=metric, cache=False, decomposition=decomposition)
+        total = time.perf_counter() - t0
+    return dict(
+        case=f"{metric}/{n_facilities}fac/{days}d" + ("" if decomposition == "stl" else f"/{decomposition}"),
+        metric=metric, decomposition=decomposition, facilities=n_facilities, days=days,
+        rows=len(df), anomalies=len(out), wall_s=round(total, 4),
+        stages_s={k: round(v, 4) for k, v in prof.stages.items()},
+        peak_mem_mb=round(mem.delta_mb, 2), rows_per_s=round(len(df) / total, 1) if total else None,
+    )
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float = 0.2) -> list[dict]:
+    """Cases whose wall time (or any stage) exceeds the baseline by more than <tolerance>."""
+    base = {r["case"]: r for r in baseline}
+    regressions = []
+    for r in results:
+        b = base.get(r["case"])
+        if b is None:
+            continue
+        timings = [("wall_s", r["wall_s"], b["wall_s"])] + [
+            (f"stages_s.{k}", v, b["stages_s"][k]) for k, v in r["stages_s"].items() if k in b["stages_s"]]
+        for name, now, then in timings:
+            if then > 0 and now > then * (1 + tolerance):
+                regressions.append(dict(case=r["case"], timing=name, baseline=then, current=now,
+                                        ratio=round(now / then, 2)))
+    return regressions
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    ap.add_argument("--facilities", type=int, nargs="+")
+    ap.add_argument("--days", type=int, nargs="+")
+    ap.add_argument("--metrics", nargs="+", choices=list(FRIENDLY))
+    ap.add_argument("--decompositions", nargs="+", choices=DECOMPOSITIONS, default=["stl"])
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--compare", help="baseline results file to check for regressions")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    args = ap.parse_args(argv)
+
+    grid = dict(PRESETS[args.preset])
+    for key in ("facilities", "days", "metrics"):
+        if getattr(args, key):
+            grid[key] = getattr(args, key)
+
+    results = []
+    for n_fac, days, metric, dec in product(grid["facilities"], grid["days"], grid["metrics"],
+                                            args.decompositions):
+        r = run_case(n_fac, days, metric, seed=args.seed, decomposition=dec)
+        results.append(r)
+        print(f"{r['case']:<40} {r['wall_s']:>9.2f}s {r['rows_per_s']:>10,.0f} rows/s "
+              f"{r['peak_mem_mb']:>8.1f} MB", flush=True)
+
+    Path(args.out).write_text(json.dumps(dict(
+        python=sys.version.split()[0], platform=platform.platform(), results=results), indent=2))
+    print(f"wrote {args.out}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for reg in regressions:
+            print(f"REGRESSION {reg['case']} {reg['timing']}: {reg['baseline']}s -> {reg['current']}s "
+                  f"(x{reg['ratio']})")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
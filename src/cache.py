@@ -0,0 +1,120 @@
+# src/cache.py
+from __future__ import annotations
+import hashlib
+import sys
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable
+
+import numpy as np
+import pandas as pd
+
+def fingerprint_array(values: np.ndarray) -> str:
+    arr = np.ascontiguousarray(values)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str((arr.dtype.str, arr.shape)).encode())
+    h.update(arr.tobytes())
+    return h.hexdigest()
+
+def fingerprint_frame(df: pd.DataFrame) -> str:
+    """Content hash of a frame: values, column names and dtypes (row order matters, index does not)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str([(c, str(t)) for c, t in df.dtypes.items()]).encode())
+    h.update(fingerprint_array(pd.util.hash_pandas_object(df, index=False).values).encode())
+    return h.hexdigest()
+
+def frame_nbytes(value: Any) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(frame_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(frame_nbytes(v) for v in value.values())
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """Thread-safe least-recently-used map bounded by entry count and, optionally, bytes."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int | None = None,
+                 sizeof: Callable[[Any], int] = frame_nbytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._sizes: dict[Hashable, int] = {}
+        self._lock = Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= self._sizes.pop(key)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._sizes[key] = size
+            self.nbytes += size
+            # the newest entry always stays, even if it alone exceeds max_bytes
+            while len(self._data) > 1 and (
+                len(self._data) > self.max_entries
+                or (self.max_bytes is not None and self.nbytes > self.max_bytes)
+            ):
+                old, _ = self._data.popitem(last=False)
+                self.nbytes -= self._sizes.pop(old)
+                self.evictions += 1
+
+    def resize(self, max_entries: int | None = None, max_bytes: int | None = None) -> None:
+        """Tighten or loosen bounds; a byte bound only counts entries stored while one was set."""
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        with self._lock:
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_bytes is not None and self.nbytes > self.max_bytes)
+            ):
+                old, _ = self._data.popitem(last=False)
+                self.nbytes -= self._sizes.pop(old)
+                self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        return dict(entries=len(self._data), bytes=self.nbytes, hits=self.hits,
+                    misses=self.misses, evictions=self.evictions)
+
+    def get_or_compute(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = fn()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.nbytes = 0
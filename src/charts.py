@@ -0,0 +1,124 @@
+# src/charts.py
+"""Chart data for large portfolios: downsampled series, WebGL traces, percentile bands.
+
+Every facility's series is cut to the visible date window and downsampled to at most
+MAX_POINTS_PER_SERIES points (LTTB keeps the visual shape, min-max keeps every peak
+and trough), so the browser payload is bounded by the facility count, not the
+history length. Above WEBGL_POINTS points the traces switch to Scattergl. Beyond
+BAND_FACILITIES facilities, one line per facility stops being readable; the chart
+shows the portfolio's p10/p50/p90 bands plus the anomaly markers instead.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+MAX_POINTS_PER_SERIES = 500
+WEBGL_POINTS = 5_000
+BAND_FACILITIES = 30
+MAX_MARKERS = 2_000
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of <n_out> points that keep the line's shape."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)  # n_out - 2 buckets between the end points
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        # twice the triangle area (previous pick, candidate, next bucket's centroid)
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of each bucket's min and max (n_out // 2 buckets), in order."""
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    bucket = np.arange(n) * (n_out // 2) // n
+    s = pd.Series(y)
+    idx = np.r_[s.groupby(bucket).idxmin().to_numpy(), s.groupby(bucket).idxmax().to_numpy(), 0, n - 1]
+    return np.unique(idx)
+
+def downsample(x: np.ndarray, y: np.ndarray, n_out: int = MAX_POINTS_PER_SERIES,
+               method: str = "lttb") -> np.ndarray:
+    """Indices to keep from one series (NaN points are dropped first)."""
+    keep = np.flatnonzero(np.isfinite(y))
+    if method == "lttb":
+        picked = lttb_indices(x[keep].astype(float), y[keep], n_out)
+    elif method == "minmax":
+        picked = minmax_indices(y[keep], n_out)
+    else:
+        raise ValueError(f"unknown downsampling method {method!r}")
+    return keep[picked]
+
+def _window(frame: pd.DataFrame, window: tuple | None) -> pd.DataFrame:
+    if window is None or frame.empty:
+        return frame
+    start, end = (pd.Timestamp(w) if w is not None else None for w in window)
+    mask = np.ones(len(frame), dtype=bool)
+    if start is not None:
+        mask &= (frame["date"] >= start).to_numpy()
+    if end is not None:
+        mask &= (frame["date"] <= end).to_numpy()
+    return frame[mask]
+
+def percentile_bands(scored: pd.DataFrame, metric: str, q=(0.1, 0.5, 0.9)) -> pd.DataFrame:
+    """Per-date percentiles of <metric> across facilities: columns p10, p50, p90 (by <q>)."""
+    bands = scored.groupby("date")[metric].quantile(list(q)).unstack()
+    bands.columns = [f"p{round(v * 100)}" for v in q]
+    return bands
+
+def portfolio_figure(scored: pd.DataFrame, metric: str, anomalies: pd.DataFrame | None = None,
+                     window: tuple | None = None, max_points: int = MAX_POINTS_PER_SERIES,
+                     method: str = "lttb", webgl_points: int = WEBGL_POINTS,
+                     band_facilities: int = BAND_FACILITIES, label: str | None = None) -> go.Figure:
+    """Line chart of <metric> per facility (or percentile bands) with anomaly markers."""
+    label = label or metric
+    scored = _window(scored, window)
+    anomalies = _window(anomalies, window) if anomalies is not None else None
+    n_fac = scored["facility"].nunique() if not scored.empty else 0
+    fig = go.Figure()
+
+    if n_fac > band_facilities:
+        bands = percentile_bands(scored, metric)
+        x = bands.index.to_numpy()
+        idx = downsample(x.astype("int64"), bands["p50"].to_numpy(dtype=float), max_points, "minmax")
+        bands = bands.iloc[idx]
+        total = 3 * len(bands)
+        Trace = go.Scattergl if total > webgl_points else go.Scatter
+        fig.add_trace(Trace(x=bands.index, y=bands["p90"], mode="lines", line=dict(width=0),
+                            name="p90", showlegend=False, hoverinfo="skip"))
+        fig.add_trace(Trace(x=bands.index, y=bands["p10"], mode="lines", line=dict(width=0), fill="tonexty",
+                            fillcolor="rgba(99,110,250,0.2)", name=f"p10–p90 of {n_fac} facilities"))
+        fig.add_trace(Trace(x=bands.index, y=bands["p50"], mode="lines", name="median facility"))
+        legend_title = "Portfolio"
+    else:
+        traces = []
+        for fac, sub in scored.groupby("facility", observed=True, sort=True):
+            x = sub["date"].to_numpy()
+            idx = downsample(x.astype("int64"), sub[metric].to_numpy(dtype=float), max_points, method)
+            traces.append((fac, x[idx], sub[metric].to_numpy()[idx]))
+        total = sum(len(t[1]) for t in traces)
+        Trace = go.Scattergl if total > webgl_points else go.Scatter
+        for fac, x, y in traces:
+            fig.add_trace(Trace(x=x, y=y, mode="lines", name=f"{fac}"))
+        legend_title = "Facility"
+
+    if anomalies is not None and not anomalies.empty:
+        if len(anomalies) > MAX_MARKERS and "priority_score" in anomalies:
+            anomalies = anomalies.nlargest(MAX_MARKERS, "priority_score")
+        Marker = go.Scattergl if total + len(anomalies) > webgl_points else go.Scatter
+        fig.add_trace(Marker(
+            x=anomalies["date"], y=anomalies[metric], mode="markers", name="anomaly",
+            text=anomalies["facility"].astype(str), marker=dict(size=10, symbol="x")))
+    fig.update_layout(xaxis_title="Date", yaxis_title=label, legend_title=legend_title)
+    return fig
@@ -1,61 +1,128 @@
 # src/data_gen.py
 from __future__ import annotations
+import argparse
+from typing import Iterator
 import numpy as np
 import pandas as pd
+from .schema import METRIC_DTYPES, coerce_dataset
+
+# Ground-truth column (True on the days an anomaly was injected), emitted with labels=True
+TRUTH_COLUMN = "injected"
 
 def _seasonal_pattern(n, period=7, amplitude=1.0):
     x = np.arange(n)
     return amplitude * (np.sin(2*np.pi * x/period) + 0.3*np.cos(2*np.pi * x/period))
 
-def generate_dataset(days: int = 210, n_facilities: int = 12, seed: int = 42) -> pd.DataFrame:
+def make_facility_ids(n_facilities: int) -> list[str]:
+    # zero-padded so lexical order (the categorical order) matches numeric order
+    width = max(3, len(str(n_facilities)))
+    return [f"FAC-{i:0{width}d}" for i in range(1, n_facilities + 1)]
+
+def generate_dataset(days: int = 210, n_facilities: int = 12, seed: int = 42, labels: bool = False) -> pd.DataFrame:
     rng = np.random.default_rng(seed)
     end_date = pd.Timestamp.today().normalize()
-    return _gen_range(end_date=end_date, days=days, n_facilities=n_facilities, rng=rng)
+    return _gen_range(end_date=end_date, days=days, n_facilities=n_facilities, rng=rng, labels=labels)
+
+def iter_dataset(days: int = 210, n_facilities: int = 12, seed: int = 42, chunk_facilities: int = 1000,
+                 end_date: pd.Timestamp | None = None, labels: bool = False) -> Iterator[pd.DataFrame]:
+    """Yield the portfolio in facility-aligned chunks of <chunk_facilities> facilities.
+
+    Each chunk draws from its own stream spawned off <seed>, so output is reproducible
+    for a given (seed, chunk_facilities) and memory stays bounded by one chunk.
+    """
+    end_date = pd.Timestamp.today().normalize() if end_date is None else pd.Timestamp(end_date)
+    ids = make_facility_ids(n_facilities)
+    starts = range(0, n_facilities, chunk_facilities)
+    for start, child in zip(starts, np.random.SeedSequence(seed).spawn(len(starts))):
+        chunk_ids = ids[start:start + chunk_facilities]
+        yield _gen_range(end_date=end_date, days=days, n_facilities=len(chunk_ids),
+                         rng=np.random.default_rng(child), facility_ids=chunk_ids, labels=labels)
+
+def write_parquet(path: str, days: int = 210, n_facilities: int = 12, seed: int = 42,
+                  chunk_facilities: int = 1000, labels: bool = False) -> int:
+    """Stream iter_dataset straight into a Parquet file (one row group per chunk); returns rows written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("date", pa.timestamp("ns")), ("facility", pa.string())]
+                       + [(m, pa.from_numpy_dtype(np.dtype(t))) for m, t in METRIC_DTYPES.items()]
+                       + ([(TRUTH_COLUMN, pa.bool_())] if labels else []))
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in iter_dataset(days, n_facilities, seed, chunk_facilities, labels=labels):
+            # plain strings: per-chunk categoricals would change the dictionary type between row groups
+            chunk = chunk.assign(facility=chunk["facility"].astype(str))
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    return rows
 
 def extend_dataset(df: pd.DataFrame, days: int = 30, seed: int | None = None) -> pd.DataFrame:
-    """Continue the series by <days> using same facilities & behavior."""
+    """Continue the series by <days> using same facilities & behavior (and labels, if <df> has them)."""
     if df.empty:
         return df
     rng = np.random.default_rng(seed)
-    end_date = pd.to_datetime(df["date"]).max()
-    return pd.concat(
-        [df, _gen_range(end_date=end_date + pd.Timedelta(days=days), days=days,
-                        n_facilities=df["facility"].nunique(), rng=rng,
-                        facility_ids=sorted(df["facility"].unique()))],
-        ignore_index=True
-    )
-
-def _gen_range(end_date: pd.Timestamp, days: int, n_facilities: int, rng, facility_ids: list[str] | None = None):
+    df = coerce_dataset(df)
+    end_date = df["date"].max()
+    ids = sorted(df["facility"].unique())
+    new = _gen_range(end_date=end_date + pd.Timedelta(days=days), days=days,
+                     n_facilities=len(ids), rng=rng, facility_ids=ids, labels=TRUTH_COLUMN in df.columns)
+    # same categories on both sides, so concat keeps the compact dtypes
+    return pd.concat([df, new], ignore_index=True)
+
+def _gen_range(end_date: pd.Timestamp, days: int, n_facilities: int, rng, facility_ids: list[str] | None = None,
+               labels: bool = False):
+    # All facilities at once: per-facility parameters are (F, 1) columns broadcast over (F, days)
     dates = pd.date_range(end=end_date, periods=days, freq="D")
-    rows = []
-    for f in range(n_facilities):
-        facility = facility_ids[f] if facility_ids else f"FAC-{f+1:03d}"
-        rev_base = rng.uniform(6000, 18000)
-        payrate_base = rng.uniform(0.86, 0.97)
-        moveins_base = rng.integers(1, 7)
-        delin_base = rng.uniform(0.02, 0.08)
-
-        season = _seasonal_pattern(days, period=7, amplitude=rng.uniform(0.2, 0.5))
-
-        billed_rev = (rev_base * (1 + 0.08*season) + rng.normal(0, rev_base*0.03, size=days)).clip(1000, None)
-        pay_success = (payrate_base + 0.03*season + rng.normal(0, 0.01, size=days)).clip(0.5, 1.0)
-        move_ins = (moveins_base + 2*season + rng.normal(0, 1.0, size=days)).round().clip(0, None)
-        delinq = (delin_base - 0.01*season + rng.normal(0, 0.003, size=days)).clip(0.0, 0.3)
-
-        # Inject a few anomalies per facility
-        idxs = rng.choice(np.arange(days), size=rng.integers(2, 6), replace=False)
-        for i in idxs:
-            billed_rev[i] *= rng.uniform(0.5, 1.7)
-            pay_success[i] += rng.uniform(-0.15, 0.15)
-            move_ins[i] += rng.integers(-4, 6)
-            delinq[i] += rng.uniform(-0.04, 0.08)
-
-        rows.append(pd.DataFrame({
-            "date": dates.date,
-            "facility": facility,
-            "billed_revenue": billed_rev,
-            "payment_success_rate": pay_success,
-            "move_ins": move_ins,
-            "delinquencies": delinq,
-        }))
-    return pd.concat(rows, ignore_index=True)
+    ids = list(facility_ids) if facility_ids else make_facility_ids(n_facilities)
+    F, D = n_facilities, days
+    rev_base = rng.uniform(6000, 18000, size=(F, 1))
+    payrate_base = rng.uniform(0.86, 0.97, size=(F, 1))
+    moveins_base = rng.integers(1, 7, size=(F, 1))
+    delin_base = rng.uniform(0.02, 0.08, size=(F, 1))
+
+    season = _seasonal_pattern(D, period=7, amplitude=rng.uniform(0.2, 0.5, size=(F, 1)))
+
+    billed_rev = (rev_base * (1 + 0.08*season) + rng.normal(0, 1, size=(F, D)) * (rev_base*0.03)).clip(1000, None)
+    pay_success = (payrate_base + 0.03*season + rng.normal(0, 0.01, size=(F, D))).clip(0.5, 1.0)
+    move_ins = (moveins_base + 2*season + rng.normal(0, 1.0, size=(F, D))).round().clip(0, None)
+    delinq = (delin_base - 0.01*season + rng.normal(0, 0.003, size=(F, D))).clip(0.0, 0.3)
+
+    # Inject a few anomalies per facility: 2–5 distinct days, picked as the first
+    # n slots of a per-facility random permutation of days
+    n_anom = np.minimum(rng.integers(2, 6, size=F), D)
+    order = np.argsort(rng.random((F, D)), axis=1)
+    injected = np.zeros((F, D), dtype=bool)
+    injected[np.arange(F)[:, None], order] = np.arange(D)[None, :] < n_anom[:, None]
+    k = int(injected.sum())
+    billed_rev[injected] *= rng.uniform(0.5, 1.7, size=k)
+    pay_success[injected] += rng.uniform(-0.15, 0.15, size=k)
+    move_ins[injected] += rng.integers(-4, 6, size=k)
+    delinq[injected] += rng.uniform(-0.04, 0.08, size=k)
+
+    cats = sorted(ids)
+    df = pd.DataFrame({
+        "date": np.tile(dates.values, F),
+        "facility": pd.Categorical.from_codes(np.repeat(pd.Index(cats).get_indexer(ids), D), categories=cats),
+        "billed_revenue": billed_rev.ravel(),
+        "payment_success_rate": pay_success.ravel(),
+        "move_ins": move_ins.ravel(),
+        "delinquencies": delinq.ravel(),
+    })
+    if labels:
+        df[TRUTH_COLUMN] = injected.ravel()
+    return coerce_dataset(df, facilities=ids)
+
+def main(argv: list[str] | None = None):
+    ap = argparse.ArgumentParser(description="Write a synthetic facility portfolio to Parquet.")
+    ap.add_argument("out")
+    ap.add_argument("--facilities", type=int, default=1000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--chunk-facilities", type=int, default=1000)
+    ap.add_argument("--labels", action="store_true", help=f"add the '{TRUTH_COLUMN}' ground-truth column")
+    args = ap.parse_args(argv)
+    rows = write_parquet(args.out, args.days, args.facilities, args.seed, args.chunk_facilities, args.labels)
+    print(f"wrote {rows:,} rows to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# src/evaluate.py
+"""Accuracy-vs-latency evaluation of detector configurations.
+
+    python -m src.evaluate --facilities 100 --days 365
+    python -m src.evaluate --decompositions stl classical median --cascade --pooled --out eval.json
+    python -m src.evaluate --input labeled.parquet --metrics billed_revenue move_ins
+
+Every configuration (decomposition engine × cascade on/off × pooled on/off) runs an
+uncached end-to-end `detect_anomalies_multi` on the same labeled data (synthetic, or
+any CSV/Parquet with an `injected` column). Each run reports precision/recall/F1
+against the injected days next to wall time, rows/sec and peak memory. A configuration
+is rejected when its F1 falls more than `--max-f1-drop` below the baseline (the first
+configuration: STL, no cascade, no pooling), and the run exits non-zero if any are.
+"""
+from __future__ import annotations
+import argparse
+import json
+import platform
+import sys
+import time
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .data_gen import TRUTH_COLUMN, generate_dataset
+from .model import DECOMPOSITIONS, FRIENDLY, detect_anomalies_multi
+from .profiling import PeakRSS
+from .schema import coerce_dataset
+
+def precision_recall_f1(flagged: int, hits: int, positives: int | None) -> dict:
+    """Scores for <hits> true positives among <flagged> alerts; NaN where undefined."""
+    if positives is None:
+        return dict(true_positives=np.nan, precision=np.nan, recall=np.nan, f1=np.nan)
+    precision = hits / flagged if flagged else np.nan
+    recall = hits / positives if positives else np.nan
+    f1 = 2 * hits / (flagged + positives) if flagged + positives else np.nan
+    return dict(true_positives=hits, precision=precision, recall=recall, f1=f1)
+
+def score_alerts(anomalies: pd.DataFrame, df: pd.DataFrame, metrics: list[str],
+                 truth: str = TRUTH_COLUMN) -> dict:
+    """Micro-averaged scores of an anomalies table: every (injected day, metric) is a positive."""
+    days = df.loc[df[truth].astype(bool), ["date", "facility"]].astype({"facility": str})
+    flagged = anomalies[["date", "facility"]].astype({"facility": str})
+    hits = len(flagged.merge(days, on=["date", "facility"]))
+    return dict(alerts=len(anomalies), **precision_recall_f1(len(anomalies), hits, len(days) * len(metrics)))
+
+def run_config(df: pd.DataFrame, metrics: list[str], decomposition: str = "stl", cascade: bool = False,
+               pooled: bool = False, **detect_kw) -> dict:
+    with PeakRSS() as mem:
+        t0 = time.perf_counter()
+        anomalies, _ = detect_anomalies_multi(df, metrics, decomposition=decomposition, cascade=cascade,
+                                              pooled=pooled, cache=False, **detect_kw)
+        wall = time.perf_counter() - t0
+    name = "+".join([decomposition] + ["cascade"] * cascade + ["pooled"] * pooled)
+    return dict(config=name, decomposition=decomposition, cascade=cascade, pooled=pooled,
+                wall_s=round(wall, 4), rows_per_s=round(len(df) / wall, 1) if wall else None,
+                peak_mem_mb=round(mem.delta_mb, 2), **score_alerts(anomalies, df, metrics))
+
+def verdicts(results: list[dict], max_f1_drop: float = 0.02) -> list[dict]:
+    """Mark each result against the first (baseline): speedup, F1 delta, accepted."""
+    base = results[0]
+    for r in results:
+        r["speedup"] = round(base["wall_s"] / r["wall_s"], 2) if r["wall_s"] else None
+        r["f1_delta"] = round(r["f1"] - base["f1"], 4)
+        r["accepted"] = bool(r["f1_delta"] >= -max_f1_drop)
+    return results
+
+def load_labeled(path: str | Path) -> pd.DataFrame:
+    path = Path(path)
+    df = pd.read_parquet(path) if path.suffix.lower() in (".parquet", ".pq") else pd.read_csv(path)
+    if TRUTH_COLUMN not in df.columns:
+        raise SystemExit(f"{path}: no '{TRUTH_COLUMN}' ground-truth column")
+    return coerce_dataset(df)
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--input", help="labeled CSV/Parquet instead of generated data")
+    ap.add_argument("--facilities", type=int, default=50)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--metrics", nargs="+", choices=list(FRIENDLY), default=["billed_revenue"])
+    ap.add_argument("--decompositions", nargs="+", choices=DECOMPOSITIONS, default=list(DECOMPOSITIONS))
+    ap.add_argument("--cascade", action="store_true", help="also evaluate each engine with cascade triage")
+    ap.add_argument("--pooled", action="store_true", help="also evaluate each engine with a pooled forest")
+    ap.add_argument("--stl-period", type=int, default=7)
+    ap.add_argument("--contamination", type=float, default=0.015)
+    ap.add_argument("--z", type=float, default=3.0)
+    ap.add_argument("--max-f1-drop", type=float, default=0.02, help="allowed F1 loss vs the baseline")
+    ap.add_argument("--out", default="eval_results.json")
+    args = ap.parse_args(argv)
+
+    df = load_labeled(args.input) if args.input else generate_dataset(
+        days=args.days, n_facilities=args.facilities, seed=args.seed, labels=True)
+    # baseline first: stl, no cascade, no pooling
+    decompositions = sorted(args.decompositions, key=lambda d: d != "stl")
+    grid = product(decompositions, [False, True] if args.cascade else [False],
+                   [False, True] if args.pooled else [False])
+    results = []
+    for dec, cascade, pooled in grid:
+        r = run_config(df, args.metrics, dec, cascade, pooled, stl_period=args.stl_period,
+                       iforest_contamination=args.contamination, z_abs_threshold=args.z)
+        results.append(r)
+        print(f"{r['config']:<28} {r['wall_s']:>8.2f}s {r['rows_per_s']:>10,.0f} rows/s {r['peak_mem_mb']:>7.1f} MB  "
+              f"P {r['precision']:.3f}  R {r['recall']:.3f}  F1 {r['f1']:.3f}", flush=True)
+
+    verdicts(results, args.max_f1_drop)
+    for r in results[1:]:
+        print(f"{r['config']:<28} x{r['speedup']:<6} F1 {r['f1_delta']:+.3f}  "
+              f"{'ACCEPT' if r['accepted'] else 'REJECT'}")
+    Path(args.out).write_text(json.dumps(dict(
+        python=sys.version.split()[0], platform=platform.platform(), rows=len(df), metrics=args.metrics,
+        baseline=results[0]["config"], results=results), indent=2))
+    print(f"wrote {args.out}")
+    return 0 if all(r["accepted"] for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
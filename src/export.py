@@ -0,0 +1,121 @@
+# src/export.py
+"""Chunked CSV/Parquet export of anomalies, alerts and scored data.
+
+Frames are written to a temp file <chunk_rows> rows at a time: each chunk is cut to
+the selected columns and its dates are formatted with one vectorized strftime, so
+the peak extra memory is one formatted chunk rather than a formatted copy of the
+whole table plus its CSV text. Parquet keeps real timestamps. Old export files are
+removed after <EXPORT_TTL_S> seconds. `Sink` is the append-only writer shared with
+the batch scorer (src/batch.py).
+"""
+from __future__ import annotations
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+EXPORT_DIR = Path(tempfile.gettempdir()) / "anomaly_guard_exports"
+EXPORT_TTL_S = 3600
+CHUNK_ROWS = 100_000
+US_DATE = "%m/%d/%Y"
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+PARQUET_SUFFIXES = (".parquet", ".pq")
+
+def is_parquet(path: str | Path) -> bool:
+    return Path(path).suffix.lower() in PARQUET_SUFFIXES
+
+class Sink:
+    """Appends frames to a CSV or Parquet file as they arrive."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.rows = 0
+        self._writer = None
+        self._empty = None
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            self._empty = df
+            return
+        # categoricals differ per chunk; plain strings keep one file schema
+        df = df.assign(**{c: df[c].astype(str) for c in df.columns
+                          if isinstance(df[c].dtype, pd.CategoricalDtype)})
+        if is_parquet(self.path):
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            df.to_csv(self.path, mode="a" if self.rows else "w", header=not self.rows, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        elif not self.rows:
+            empty = self._empty if self._empty is not None else pd.DataFrame()
+            if is_parquet(self.path):
+                pq.write_table(pa.Table.from_pandas(empty, preserve_index=False), self.path)
+            else:
+                empty.to_csv(self.path, index=False)
+
+def iter_chunks(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+def _format_chunk(df: pd.DataFrame, columns: list[str] | None, date_format: str | None) -> pd.DataFrame:
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    if date_format is None:
+        return df
+    dates = [c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])]
+    return df.assign(**{c: df[c].dt.strftime(date_format) for c in dates}) if dates else df
+
+def write_chunks(frames: Iterable[pd.DataFrame], path: str | Path, columns: list[str] | None = None,
+                 date_format: str | None = US_DATE) -> int:
+    """Append <frames> to a CSV/Parquet file (by suffix); returns the rows written.
+
+    <date_format> applies to CSV only; Parquet stores typed timestamps.
+    """
+    sink = Sink(path)
+    if sink.path.suffix.lower() != ".csv":
+        date_format = None
+    try:
+        for frame in frames:
+            sink.write(_format_chunk(frame, columns, date_format))
+    finally:
+        sink.close()
+    return sink.rows
+
+def _prune(now: float | None = None):
+    now = time.time() if now is None else now
+    for f in EXPORT_DIR.glob("export-*"):
+        try:
+            if now - f.stat().st_mtime > EXPORT_TTL_S:
+                f.unlink()
+        except OSError:
+            pass  # another session removed it first
+
+def export_file(frames: pd.DataFrame | Iterable[pd.DataFrame], fmt: str = "csv",
+                columns: list[str] | None = None, date_format: str | None = US_DATE,
+                chunk_rows: int = CHUNK_ROWS) -> Path:
+    """Write a frame (or a stream of frames) to a new temp file in <fmt>; returns its path."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}; choose from {sorted(FORMATS)}")
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    _prune()
+    if isinstance(frames, pd.DataFrame):
+        frames = iter_chunks(frames, chunk_rows)
+    fd, name = tempfile.mkstemp(prefix="export-", suffix=f".{fmt}", dir=EXPORT_DIR)
+    os.close(fd)
+    try:
+        write_chunks(frames, name, columns, date_format)
+    except BaseException:
+        Path(name).unlink(missing_ok=True)
+        raise
+    return Path(name)
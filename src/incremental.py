@@ -0,0 +1,157 @@
+# src/incremental.py
+from __future__ import annotations
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+from .model import (
+    FRIENDLY, detect_anomalies, _anomaly_columns, _assemble, _fit_forest, _label_stage, _mad,
+    _priority_and_confidence, _residuals, _rolling_baselines, _rolling_zscore,
+)
+
+WINDOW = 14  # rolling z / baseline window, as in detect_anomalies
+
+class _ForestCollector:
+    """In-memory stand-in for ModelRegistry: never has a model, keeps every one saved."""
+
+    root = "incremental"
+
+    def __init__(self):
+        self.models: dict[str, IsolationForest] = {}
+
+    def load(self, facility, metric, params, features, X):
+        return None
+
+    def save(self, facility, metric, model, params, features, X, window):
+        self.models[str(facility)] = model
+
+@dataclass
+class FacilityState:
+    iforest: IsolationForest
+    offset: float
+    dec_min: float
+    dec_max: float
+    resid_mad: float
+    y_hist: np.ndarray      # trailing raw values (covers both the STL and the refit window)
+    resid_tail: np.ndarray  # last WINDOW-1 residuals feeding the rolling z of the next rows
+    last_date: pd.Timestamp
+    rows_since_fit: int = 0
+
+class IncrementalDetector:
+    """Scores only rows newer than what each facility has seen, refitting on a schedule.
+
+    Per facility it keeps the fitted forest, a trailing STL window and the rolling-window
+    buffers, so an update costs O(new days) instead of a full-history rescan. Scores are
+    close to, not identical with, a full rescan: STL sees only the trailing window and the
+    forest is trained on the last <train_window> days at the most recent refit.
+    """
+
+    def __init__(self, metric: str, stl_period: int = 7, iforest_contamination: float = 0.015,
+                 z_abs_threshold: float = 3.0, stl_window: int = 56, train_window: int = 365,
+                 refit_every: int = 90, decomposition: str = "stl"):
+        assert metric in FRIENDLY
+        self.metric = metric
+        self.stl_period = stl_period
+        self.iforest_contamination = iforest_contamination
+        self.z_abs_threshold = z_abs_threshold
+        self.stl_window = max(stl_window, 2 * stl_period + 1)
+        self.train_window = train_window
+        self.refit_every = refit_every
+        self.decomposition = decomposition
+        self.states: dict[str, FacilityState] = {}
+        self.fit_count = 0  # forests behind the current states, counting the initial scan's
+
+    @property
+    def signature(self) -> tuple:
+        return (self.metric, int(self.stl_period), float(self.iforest_contamination),
+                float(self.z_abs_threshold), self.decomposition)
+
+    def fit(self, df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Full scan of <df> (same result as detect_anomalies) that also seeds per-facility state.
+
+        The scan's own forests are kept for facilities whose history fits in <train_window>,
+        so only longer histories fit a second forest (on their last <train_window> days).
+        """
+        forests = _ForestCollector()
+        out, scored = detect_anomalies(
+            df, metric=self.metric, stl_period=self.stl_period,
+            iforest_contamination=self.iforest_contamination, z_abs_threshold=self.z_abs_threshold,
+            decomposition=self.decomposition, registry=forests, cache=False)
+        for fac, sub in scored.groupby("facility", sort=False, observed=True):
+            y = sub[self.metric].values.astype(float)
+            last_date = pd.to_datetime(sub["date"]).max()
+            if len(y) <= self.train_window and str(fac) in forests.models:
+                resid = sub[f"{self.metric}_residual"].to_numpy(dtype=float)
+                X = np.c_[resid, sub["rolling_z"].to_numpy(), sub["level_rolling_z"].to_numpy()]
+                self._seed(fac, y, last_date, resid, forests.models[str(fac)], X)
+            else:
+                self._refit(fac, y, last_date)
+        return out, scored
+
+    def update(self, df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Score rows of <df> newer than each facility's last seen date; older rows are ignored."""
+        dates = pd.to_datetime(df["date"])
+        last = df["facility"].astype(str).map({f: s.last_date for f, s in self.states.items()})
+        fresh = df[last.isna() | (dates > pd.to_datetime(last))]
+        if fresh.empty:
+            return pd.DataFrame(columns=_anomaly_columns(self.metric) + ["metric"]), fresh.copy()
+
+        known = fresh["facility"].isin(list(self.states))
+        outs, frames = [], []
+        if (~known).any():
+            # Facilities never seen before get a full scan of what they have
+            out, scored = self.fit(fresh[~known])
+            outs.append(out); frames.append(scored)
+        for fac, sub in fresh[known].sort_values("date").groupby("facility", observed=True):
+            out, scored = self._score_new(fac, sub)
+            outs.append(out); frames.append(scored)
+
+        out = pd.concat(outs, ignore_index=True).sort_values(["date", "facility"]).reset_index(drop=True)
+        return out, pd.concat(frames, ignore_index=True)
+
+    def _refit(self, fac: str, y_hist: np.ndarray, last_date: pd.Timestamp):
+        y = y_hist[-self.train_window:]
+        resid = _residuals(y, period=self.stl_period, method=self.decomposition)
+        X = np.c_[resid, _rolling_zscore(resid, window=WINDOW), _rolling_zscore(y, window=WINDOW)]
+        self._seed(fac, y_hist, last_date, resid, _fit_forest(X), X)
+
+    def _seed(self, fac: str, y_hist: np.ndarray, last_date: pd.Timestamp, resid: np.ndarray,
+              iforest: IsolationForest, X: np.ndarray):
+        scores = iforest.score_samples(X)
+        offset = float(np.percentile(scores, 100.0 * self.iforest_contamination))
+        self.states[fac] = FacilityState(
+            iforest=iforest, offset=offset,
+            dec_min=float(scores.min() - offset), dec_max=float(scores.max() - offset),
+            resid_mad=_mad(resid), y_hist=y_hist[-max(self.train_window, self.stl_window):].copy(),
+            resid_tail=resid[-(WINDOW - 1):].copy(), last_date=last_date,
+        )
+        self.fit_count += 1
+
+    def _score_new(self, fac: str, sub: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+        state = self.states[fac]
+        y_new = sub[self.metric].values.astype(float)
+        k = len(y_new)
+
+        resid = _residuals(np.r_[state.y_hist[-self.stl_window:], y_new], period=self.stl_period,
+                           method=self.decomposition)[-k:]
+        rz = _rolling_zscore(np.r_[state.resid_tail, resid], window=WINDOW)[-k:]
+        y_ctx = np.r_[state.y_hist[-(WINDOW - 1):], y_new]
+        lvl_rz = _rolling_zscore(y_ctx, window=WINDOW)[-k:]
+        base_mean, base_median = (b[-k:] for b in _rolling_baselines(y_ctx, window=WINDOW))
+
+        iso_decision = state.iforest.score_samples(np.c_[resid, rz, lvl_rz]) - state.offset
+        state.dec_min = min(state.dec_min, float(iso_decision.min()))
+        state.dec_max = max(state.dec_max, float(iso_decision.max()))
+        priority, priority_score, confidence = _priority_and_confidence(
+            np.abs(rz), resid, state.resid_mad, iso_decision, state.dec_min, state.dec_max)
+        labels = _label_stage(iso_decision, rz, self.z_abs_threshold)
+
+        state.y_hist = np.r_[state.y_hist, y_new][-max(self.train_window, self.stl_window):]
+        state.resid_tail = np.r_[state.resid_tail, resid][-(WINDOW - 1):]
+        state.last_date = pd.to_datetime(sub["date"]).max()
+        state.rows_since_fit += k
+        if state.rows_since_fit >= self.refit_every:
+            self._refit(fac, state.y_hist, state.last_date)
+
+        return _assemble(sub.reset_index(drop=True), self.metric, resid, rz, lvl_rz, iso_decision,
+                         labels, priority, priority_score, confidence, base_mean, base_median)
@@ -1,9 +1,17 @@
 # src/model.py
 from __future__ import annotations
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 import numpy as np
 import pandas as pd
+from scipy import ndimage
 from sklearn.ensemble import IsolationForest
 from statsmodels.tsa.seasonal import STL
+from .cache import LRUCache, fingerprint_array
+from .profiling import current_profile, profiled, stage, timed_call
+from .registry import FEATURES, ModelRegistry
 
 FRIENDLY = {
     "billed_revenue": "Billed Revenue",
@@ -12,45 +20,472 @@ FRIENDLY = {
     "delinquencies": "Delinquencies",
 }
 
+# serial: one facility after another; thread/process: facility chunks spread over a pool
+EXECUTORS = ("serial", "thread", "process")
+
+# stl: robust statsmodels STL per series (accurate, default); classical / median: batched
+# moving-average or moving-median trend + per-phase seasonal means/medians over a
+# facilities x days array (see README "Decomposition engines" for the trade-off)
+DECOMPOSITIONS = ("stl", "classical", "median")
+
+FOREST_PARAMS = dict(n_estimators=200, random_state=42)
+# One forest over the whole portfolio: a bounded subsample per tree keeps the fit
+# cost flat however many facilities are stacked
+POOLED_PARAMS = dict(FOREST_PARAMS, max_samples=1024)
+
+# Cascade screen on the 14-day rolling |z| of deseasonalized levels. That statistic tops
+# out at 13/sqrt(14) ≈ 3.47, so it gets its own threshold rather than sharing triage_z.
+TRIAGE_RZ = 2.5
+
+# Per-facility stage results (STL residuals, forest scores), shared by all callers
+_STAGE_CACHE = LRUCache(max_entries=20_000)
+
 def _stl_residuals(y: np.ndarray, period: int = 7) -> np.ndarray:
     s = pd.Series(y.astype(float))
     stl = STL(s, period=period, robust=True)
     res = stl.fit()
     return (s - res.trend - res.seasonal).values
 
-def _rolling_zscore(x: np.ndarray, window: int = 14) -> np.ndarray:
-    s = pd.Series(x)
-    m = s.rolling(window, min_periods=5).mean()
-    v = s.rolling(window, min_periods=5).std()
-    z = (s - m) / (v.replace(0, np.nan))
-    return z.fillna(0.0).values
+def _fast_residuals(Y: np.ndarray, period: int = 7, method: str = "classical") -> np.ndarray:
+    """Residuals of a classical (or median) decomposition for every row of a 2-D series array."""
+    if method == "median":
+        trend = ndimage.median_filter(Y, size=(1, period | 1), mode="nearest")
+    else:
+        # centered MA; 2 x m weights for even periods, as in classical decomposition
+        w = np.ones(period) if period % 2 else np.r_[0.5, np.ones(period - 1), 0.5]
+        trend = ndimage.convolve1d(Y, w / period, axis=1, mode="nearest")
+    detrended = Y - trend
+    n_rows, n = Y.shape
+    cycles = -(-n // period)
+    padded = np.full((n_rows, cycles * period), np.nan)
+    padded[:, :n] = detrended
+    by_phase = padded.reshape(n_rows, cycles, period)
+    seasonal = np.nanmedian(by_phase, axis=1) if method == "median" else np.nanmean(by_phase, axis=1)
+    seasonal -= seasonal.mean(axis=1, keepdims=True)
+    return detrended - np.tile(seasonal, cycles)[:, :n]
+
+def _batched_residuals(Y: np.ndarray, spans: list, period: int, method: str) -> np.ndarray:
+    # Facilities of equal length (normally all of them) are decomposed as one 2-D block
+    n_met = Y.shape[1]
+    lengths = np.array([b - a for a, b in spans])
+    resid = np.empty_like(Y, dtype=float)
+    for n in np.unique(lengths):
+        idx = np.flatnonzero(lengths == n)
+        rows = np.concatenate([np.arange(*spans[i]) for i in idx])
+        block = Y[rows].reshape(len(idx), n, n_met).transpose(0, 2, 1).reshape(-1, n)
+        resid[rows] = (_fast_residuals(block, period, method)
+                       .reshape(len(idx), n_met, n).transpose(0, 2, 1).reshape(-1, n_met))
+    return resid
+
+def _residuals(y: np.ndarray, period: int = 7, method: str = "stl") -> np.ndarray:
+    if method == "stl":
+        return _stl_residuals(y, period=period)
+    return _fast_residuals(np.asarray(y, dtype=float)[None, :], period, method)[0]
+
+def _pd(x: np.ndarray):
+    return pd.DataFrame(x) if x.ndim == 2 else pd.Series(x)
+
+def _rolling(x: np.ndarray, window: int, min_periods: int, groups: np.ndarray | None = None):
+    # <groups> labels contiguous, ascending runs (one per facility), so the grouped
+    # result comes back in input order and every window stays inside one facility.
+    # 2-D input (rows × metrics) rolls every column in the same pass.
+    s = _pd(x)
+    return (s.groupby(groups) if groups is not None else s).rolling(window, min_periods=min_periods)
+
+def _rolling_zscore(x: np.ndarray, window: int = 14, groups: np.ndarray | None = None) -> np.ndarray:
+    r = _rolling(x, window, 5, groups)
+    m = r.mean().values
+    v = r.std().values
+    v[v == 0] = np.nan
+    z = (x - m) / v
+    return np.nan_to_num(z, nan=0.0)
+
+def _rolling_baselines(x: np.ndarray, window: int = 14,
+                       groups: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    r = _rolling(x, window, 7, groups)
+    mean, median = _pd(r.mean().values), _pd(r.median().values)
+    if groups is not None:
+        return mean.groupby(groups).bfill().values, median.groupby(groups).bfill().values
+    return mean.bfill().values, median.bfill().values
 
 def _mad(values: np.ndarray) -> float:
     med = np.median(values)
     return float(np.median(np.abs(values - med)))
 
-def _priority_and_confidence(abs_z: float, resid: float, resid_mad: float, iso_decision: float,
-                             dec_min: float, dec_max: float) -> tuple[str, float, float]:
-    resid_scale = 0.0
-    if resid_mad and resid_mad > 0:
-        resid_scale = min(abs(resid) / (3 * resid_mad), 1.0)
+def _priority_and_confidence(abs_z, resid, resid_mad, iso_decision, dec_min, dec_max):
+    """Vectorized over rows; per-facility inputs (resid_mad, dec_min, dec_max) are broadcast per row."""
+    abs_z, resid, resid_mad, iso_decision, dec_min, dec_max = map(
+        np.asarray, (abs_z, resid, resid_mad, iso_decision, dec_min, dec_max))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        resid_scale = np.where(resid_mad > 0, np.minimum(np.abs(resid) / (3 * resid_mad), 1.0), 0.0)
+        z_scale = np.minimum(abs_z / 4.0, 1.0)
+        score = 0.6 * z_scale + 0.4 * resid_scale
 
-    z_scale = min(abs_z / 4.0, 1.0)
-    score = 0.6 * z_scale + 0.4 * resid_scale
+        span = dec_max - dec_min
+        conf = np.where(span <= 1e-9, 0.5, 1.0 - ((iso_decision - dec_min) / span))
+    conf = np.clip(conf, 0.0, 1.0)
 
-    if dec_max - dec_min <= 1e-9:
-        conf = 0.5
-    else:
-        conf = 1.0 - ((iso_decision - dec_min) / (dec_max - dec_min))
-    conf = float(np.clip(conf, 0.0, 1.0))
+    pr = np.select([score >= 0.75, score >= 0.45], ["High", "Medium"], "Low").astype(object)
+    return pr, score, conf
+
+def _fit_forest(X: np.ndarray, params: dict = FOREST_PARAMS) -> IsolationForest:
+    # Trees do not depend on contamination; it only sets the decision offset,
+    # so callers keep raw score_samples and apply the offset themselves.
+    params = dict(params)
+    if isinstance(params.get("max_samples"), int):
+        params["max_samples"] = min(params["max_samples"], len(X))
+    return IsolationForest(contamination="auto", **params).fit(X)
+
+def _model_stage(X: np.ndarray, params: dict = FOREST_PARAMS) -> np.ndarray:
+    return _fit_forest(X, params).score_samples(X)
+
+def _normalize_features(X: np.ndarray, gid: np.ndarray) -> np.ndarray:
+    """Per-facility robust scaling (median / MAD, std when MAD is 0) so facilities can share a model."""
+    frame = pd.DataFrame(X)
+    med = frame.groupby(gid).transform("median").to_numpy()
+    dev = np.abs(X - med)
+    scale = 1.4826 * pd.DataFrame(dev).groupby(gid).transform("median").to_numpy()
+    std = frame.groupby(gid).transform("std").to_numpy()
+    scale = np.where(scale > 1e-9, scale, np.where(std > 1e-9, std, 1.0))
+    return (X - med) / scale
+
+def _registry_stage(item: tuple, registry: ModelRegistry, metric: str, params: dict,
+                    features: list[str], forest_params: dict = FOREST_PARAMS) -> np.ndarray:
+    facility, X, window = item
+    iforest = registry.load(facility, metric, params, features, X)
+    if iforest is None:
+        iforest = _fit_forest(X, forest_params)
+        registry.save(facility, metric, iforest, params, features, X, window)
+    return iforest.score_samples(X)
+
+def _why_lines(y, resid, rz, base_mean, base_median) -> list[str]:
+    return [
+        f"Unusual vs recent pattern (|Z|={az:.2f}). "
+        f"Median≈{bmed:,.2f}, Avg≈{bm:,.2f}, Diff≈{val - bmed:+,.2f}. Residual={r:.1f}."
+        for az, r, val, bm, bmed in zip(np.abs(rz), resid, y, base_mean, base_median)
+    ]
+
+def _label_stage(iso_decision: np.ndarray, rz: np.ndarray, z_abs_threshold: float,
+                 owner: np.ndarray | None = None) -> np.ndarray:
+    # <owner> restricts the forest vote to rows this metric is blamed for (multivariate mode)
+    aux_flag = np.abs(rz) >= z_abs_threshold
+    iso_flag = iso_decision < 0
+    if owner is not None:
+        iso_flag &= owner
+    return (iso_flag | aux_flag).astype(int)
+
+def why_text(frame: pd.DataFrame, metric: str) -> pd.Series:
+    """One-line “why” per row, built on demand from a scored frame's numeric columns."""
+    lines = _why_lines(frame[metric].to_numpy(dtype=float), frame[f"{metric}_residual"].to_numpy(),
+                       frame["rolling_z"].to_numpy(), frame["baseline_mean"].to_numpy(),
+                       frame["baseline_median"].to_numpy())
+    return pd.Series(lines, index=frame.index, dtype=object)
+
+def _anomaly_columns(metric: str) -> list[str]:
+    return ["date", "facility", metric, f"{metric}_residual", "rolling_z", "iso_decision",
+            "priority", "priority_score", "confidence", "why_text"]
+
+def _assemble(base: pd.DataFrame, metric: str, resid, rz, lvl_rz, iso_decision, labels,
+              priority, priority_score, confidence, base_mean, base_median) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Attach per-row results to <base> (a fresh frame) and cut the anomalies table from it.
+
+    Explanations are only written for flagged rows; `why_text(scored, metric)` builds
+    them for any other rows that get rendered or exported.
+    """
+    scored = base
+    scored[f"{metric}_residual"] = resid
+    scored["rolling_z"] = rz
+    scored["level_rolling_z"] = lvl_rz
+    scored["iso_decision"] = iso_decision
+    scored["anomaly_label"] = labels
+    scored["priority"] = priority
+    scored["priority_score"] = priority_score
+    scored["confidence"] = confidence
+    scored["baseline_mean"] = base_mean
+    scored["baseline_median"] = base_median
+
+    flagged = scored.loc[labels == 1]
+    out = flagged[_anomaly_columns(metric)[:-1]].copy()
+    with stage("explanations"):
+        out["why_text"] = why_text(flagged, metric)
+    out["metric"] = metric
+    out = out.sort_values(["date","facility"]).reset_index(drop=True)
+    return out, scored
+
+def _triage(grouped: list, metrics: list[str], triage_z: float, triage_rz: float, period: int,
+            stats: dict | None):
+    """Cheap screen: a facility is a suspect when, on any day, any metric's robust |z|
+    (distance of the raw level from its median in MADs) exceeds <triage_z>, or the 14-day
+    rolling |z| of its deseasonalized level (minus the median of its phase in the period)
+    reaches <triage_rz>. Each screen has its own threshold: a rolling |z| over n days can never
+    exceed (n-1)/sqrt(n) (≈3.47 for 14 days)."""
+    groups = [sub for _, sub in grouped]
+    lengths = np.array([len(sub) for sub in groups])
+    gid = np.repeat(np.arange(len(groups)), lengths)
+    base = pd.concat(groups, ignore_index=True)
+    Y = base[metrics].to_numpy(dtype=float)
+    bounds = np.r_[0, np.cumsum(lengths)]
+    phase = (np.arange(len(Y)) - np.repeat(bounds[:-1], lengths)) % int(period)
+    deseason = Y - pd.DataFrame(Y).groupby([gid, phase]).transform("median").to_numpy()
+    resid_rz = _rolling_zscore(deseason, window=14, groups=gid)
+    lvl_rz = _rolling_zscore(Y, window=14, groups=gid)
+    med = pd.DataFrame(Y).groupby(gid).transform("median").to_numpy()
+    mad = pd.DataFrame(np.abs(Y - med)).groupby(gid).transform("median").to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        robust_z = np.where(mad > 0, np.abs(Y - med) / (1.4826 * mad), 0.0)
+    row_hit = ((np.abs(resid_rz) >= triage_rz) | (robust_z > triage_z)).any(axis=1)
+    suspect = np.logical_or.reduceat(row_hit, bounds[:-1])
+    if stats is not None:
+        stats.update(facilities=len(groups), full_model=int(suspect.sum()), clean=int((~suspect).sum()))
+    rows = np.repeat(~suspect, lengths)
+    clean = (base[rows].reset_index(drop=True), gid[rows], lvl_rz[rows])
+    return [g for g, keep in zip(grouped, suspect) if keep], clean
+
+def _clean_scored(clean: tuple, metric: str, j: int) -> pd.DataFrame:
+    # Facilities the triage cleared: no model, never flagged; residual is the
+    # deviation from the 14-day median so plots and on-demand "why" still work.
+    base, gid, lvl_rz = clean
+    y = base[metric].to_numpy(dtype=float)
+    base_mean, base_median = _rolling_baselines(y, window=14, groups=gid)
+    resid = y - base_median
+    nan = np.full(len(y), np.nan)
+    resid_mad = pd.Series(resid).groupby(gid).transform(lambda r: _mad(r.to_numpy())).to_numpy()
+    priority, priority_score, _ = _priority_and_confidence(np.abs(lvl_rz[:, j]), resid, resid_mad, nan, nan, nan)
+    _, scored = _assemble(base.copy(), metric, resid, lvl_rz[:, j], lvl_rz[:, j], nan,
+                          np.zeros(len(y), dtype=int), priority, priority_score, nan, base_mean, base_median)
+    return scored
 
-    if score >= 0.75:
-        pr = "High"
-    elif score >= 0.45:
-        pr = "Medium"
+def _cached_map(stage: str, fn, keys: list, items: list, cache: bool = True, labels: list | None = None,
+                counter: str | None = None, **exec_kw) -> list:
+    """Run <fn> only on items whose (<stage>, key) is not cached; results keep input order.
+
+    Under an active profile each call is timed (per facility when <labels> name the
+    items) and cache hits / computed items are counted, plus <counter> per computed item.
+    """
+    prof = current_profile()
+    if cache:
+        results = [_STAGE_CACHE.get((stage,) + k) for k in keys]
+        missing = [i for i, r in enumerate(results) if r is None]
     else:
-        pr = "Low"
-    return pr, float(score), conf
+        results, missing = [None] * len(items), list(range(len(items)))
+    run = fn if prof is None else partial(timed_call, fn)
+    computed = _map_facilities(run, [items[i] for i in missing], **exec_kw)
+    for i, r in zip(missing, computed):
+        if prof is not None:
+            r, seconds = r
+            if labels is not None:
+                prof.add_facility_time(str(labels[i]), seconds)
+        if cache:
+            _STAGE_CACHE.put((stage,) + keys[i], r)
+        results[i] = r
+    if prof is not None:
+        name = stage.split("@")[0]
+        prof.count(f"{name}_cache_hits", len(items) - len(missing))
+        prof.count(f"{name}_computed", len(missing))
+        if counter:
+            prof.count(counter, len(missing))
+    return results
+
+def clear_stage_cache() -> None:
+    _STAGE_CACHE.clear()
+
+def _run_chunk(fn, chunk: list):
+    return [fn(item) for item in chunk]
+
+def _map_facilities(fn, items: list, executor: str = "serial",
+                    n_workers: int | None = None, chunk_size: int | None = None) -> list:
+    """Apply <fn> to each item, optionally on a pool; results keep input order."""
+    assert executor in EXECUTORS
+    if executor == "serial" or len(items) <= 1:
+        return [fn(item) for item in items]
+    n_workers = n_workers or os.cpu_count() or 1
+    if not chunk_size:
+        # a few chunks per worker keeps the pool busy without per-facility overhead
+        chunk_size = max(1, math.ceil(len(items) / (n_workers * 4)))
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    pool_cls = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+    with pool_cls(max_workers=n_workers) as pool:
+        results = list(pool.map(partial(_run_chunk, fn), chunks))
+    return [r for chunk in results for r in chunk]
+
+def _score_metric(base: pd.DataFrame, metric: str, y: np.ndarray, resid: np.ndarray, rz: np.ndarray,
+                  lvl_rz: np.ndarray, iso_scores: np.ndarray, bounds: np.ndarray,
+                  iforest_contamination: float, z_abs_threshold: float,
+                  owner: np.ndarray | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    lengths = np.diff(bounds)
+    spans = list(zip(bounds[:-1], bounds[1:]))
+    gid = np.repeat(np.arange(len(lengths)), lengths)
+
+    # Same offset IsolationForest(contamination=...) derives at fit time, per facility
+    offsets = [np.percentile(iso_scores[a:b], 100.0 * iforest_contamination) for a, b in spans]
+    iso_decision = iso_scores - np.repeat(offsets, lengths)
+    dec_min = np.minimum.reduceat(iso_decision, bounds[:-1])
+    dec_max = np.maximum.reduceat(iso_decision, bounds[:-1])
+    resid_mad = np.array([_mad(resid[a:b]) for a, b in spans])
+    priority, priority_score, confidence = _priority_and_confidence(
+        np.abs(rz), resid, resid_mad[gid], iso_decision, dec_min[gid], dec_max[gid])
+    labels = _label_stage(iso_decision, rz, z_abs_threshold, owner=owner)
+
+    # Baselines (last 14 days) for friendlier “why”
+    base_mean, base_median = _rolling_baselines(y, window=14, groups=gid)
+    return _assemble(base, metric, resid, rz, lvl_rz, iso_decision, labels, priority,
+                     priority_score, confidence, base_mean, base_median)
+
+@profiled("detect_anomalies")
+def detect_anomalies_multi(
+    df: pd.DataFrame,
+    metrics: list[str] | None = None,
+    stl_period: int = 7,
+    iforest_contamination: float = 0.015,
+    z_abs_threshold: float = 3.0,
+    multivariate: bool = False,
+    registry: ModelRegistry | None = None,
+    executor: str = "serial",
+    n_workers: int | None = None,
+    chunk_size: int | None = None,
+    cache: bool = True,
+    decomposition: str = "stl",
+    cascade: bool = False,
+    triage_z: float = 4.5,
+    triage_rz: float = TRIAGE_RZ,
+    stats: dict | None = None,
+    pooled: bool = False,
+) -> tuple[pd.DataFrame, dict[str, pd.DataFrame]]:
+    """Scan several metrics in one pass: one sort/group, one rolling pass over all metric columns.
+
+    Returns a combined anomalies table (a `metric` column says which signal fired; each row
+    carries its own metric's value/residual columns) and a scored frame per metric. With
+    <multivariate> one forest per facility sees every metric's features, and a forest flag
+    is attributed to the metric with the largest |rolling z| on that row. With a
+    <registry>, saved forests are loaded and reused until they age out or the data drifts.
+    <decomposition> picks the residual engine (one of DECOMPOSITIONS).
+
+    With <cascade>, a vectorized screen on levels runs first and only facilities
+    whose robust |z| exceeds <triage_z> or whose rolling |z| reaches <triage_rz> get
+    the full decomposition + forest; the rest come back
+    unflagged with NaN iso_decision/confidence. Per-stage facility counts are written
+    into <stats> when a dict is passed.
+
+    With <pooled>, features are robust-scaled per facility and stacked, and a single
+    forest (POOLED_PARAMS) is fit and scored for the whole portfolio in one call.
+    Contamination offsets and confidence bounds are still taken per facility.
+
+    Runs are profiled (see profiling.py): stage times, per-facility times and counters
+    go to any `profiling()` block around the call and to registered hooks.
+    """
+    metrics = list(metrics or FRIENDLY)
+    assert metrics and all(m in FRIENDLY for m in metrics)
+    assert decomposition in DECOMPOSITIONS
+    exec_kw = dict(executor=executor, n_workers=n_workers, chunk_size=chunk_size)
+
+    prof = current_profile()
+    prof.count("rows", len(df))
+    with stage("prepare"):
+        grouped = list(df.sort_values("date").groupby("facility", observed=True))
+    prof.count("facilities", len(grouped))
+    clean = None
+    if cascade and grouped:
+        with stage("triage"):
+            grouped, clean = _triage(grouped, metrics, triage_z, triage_rz, stl_period, stats)
+    facilities = [fac for fac, _ in grouped]
+    groups = [sub for _, sub in grouped]
+    if not groups:
+        empty = pd.concat([pd.DataFrame(columns=_anomaly_columns(m) + ["metric"]) for m in metrics])
+        if clean is None:
+            return empty.reset_index(drop=True), {m: df.copy() for m in metrics}
+        return empty.reset_index(drop=True), {m: _clean_scored(clean, m, j) for j, m in enumerate(metrics)}
+
+    with stage("prepare"):
+        lengths = np.array([len(sub) for sub in groups])
+        bounds = np.r_[0, np.cumsum(lengths)]
+        spans = list(zip(bounds[:-1], bounds[1:]))
+        gid = np.repeat(np.arange(len(groups)), lengths)
+        base = pd.concat(groups, ignore_index=True)
+        Y = base[metrics].to_numpy(dtype=float)
+    n_fac, n_met = len(groups), len(metrics)
+
+    # Per-facility stages (STL, forest) are cached on the series + period + engine;
+    # contamination and |Z| are applied afterwards, over the whole frame at once.
+    keys = [[(fingerprint_array(Y[a:b, j]), int(stl_period), decomposition) for a, b in spans]
+            for j in range(n_met)]
+    with stage("decomposition"):
+        if decomposition == "stl":
+            stl = _cached_map("stl", partial(_stl_residuals, period=stl_period),
+                              [k for ks in keys for k in ks],
+                              [Y[a:b, j] for j in range(n_met) for a, b in spans], cache=cache,
+                              labels=facilities * n_met, **exec_kw)
+            resid = np.column_stack([np.concatenate(stl[j * n_fac:(j + 1) * n_fac]) for j in range(n_met)])
+        else:
+            # cheap enough to recompute; one vectorized pass beats per-facility cache lookups
+            resid = _batched_residuals(Y, spans, int(stl_period), decomposition)
+    with stage("rolling_z"):
+        rz = _rolling_zscore(resid, window=14, groups=gid)
+        lvl_rz = _rolling_zscore(Y, window=14, groups=gid)
+
+    windows = [(str(sub["date"].iloc[0]), str(sub["date"].iloc[-1])) for sub in groups]
+
+    def forest_scores(stage: str, model_keys: list, Xs: list, label: str, features: list[str]):
+        if pooled:
+            return pooled_scores(stage, model_keys, Xs, label, features)
+        if registry is None:
+            return np.concatenate(_cached_map(stage, _model_stage, model_keys, Xs, cache=cache,
+                                              labels=facilities, counter="forest_fits", **exec_kw))
+        fn = partial(_registry_stage, registry=registry, metric=label, features=features,
+                     params=dict(FOREST_PARAMS, stl_period=int(stl_period), decomposition=decomposition))
+        return np.concatenate(_cached_map(f"{stage}@{registry.root}", fn, model_keys,
+                                          list(zip(facilities, Xs, windows)), cache=cache,
+                                          labels=facilities, counter="registry_lookups", **exec_kw))
+
+    def pooled_scores(stage: str, model_keys: list, Xs: list, label: str, features: list[str]):
+        X = _normalize_features(np.vstack(Xs), gid)
+        key = [(tuple(model_keys), "pooled")]
+        if registry is None:
+            return _cached_map(f"{stage}_pooled", partial(_model_stage, params=POOLED_PARAMS),
+                               key, [X], cache=cache, counter="forest_fits")[0]
+        # the facility set is part of the params: a forest pooled over a subset (or another
+        # portfolio) is refit, not reused, when a different set is scanned
+        fac_set = fingerprint_array(np.asarray(sorted(str(f) for f in facilities), dtype=str))
+        fn = partial(_registry_stage, registry=registry, metric=label, features=features,
+                     forest_params=POOLED_PARAMS,
+                     params=dict(POOLED_PARAMS, stl_period=int(stl_period), decomposition=decomposition,
+                                 facilities=fac_set))
+        window = (min(w[0] for w in windows), max(w[1] for w in windows))
+        return _cached_map(f"{stage}_pooled@{registry.root}", fn, key,
+                           [("__portfolio__", X, window)], cache=cache, counter="registry_lookups")[0]
+
+    with stage("forest"):
+        if multivariate:
+            X = np.column_stack([resid, rz, lvl_rz])
+            mv_keys = [tuple(keys[j][i][0] for j in range(n_met)) + (int(stl_period), decomposition)
+                       for i in range(n_fac)]
+            scores = forest_scores("model_mv", mv_keys, [X[a:b] for a, b in spans], "+".join(metrics),
+                                   [f"{m}_{f}" for f in FEATURES for m in metrics])
+            iso_scores = np.repeat(scores[:, None], n_met, axis=1)
+            blamed = np.abs(rz).argmax(axis=1)
+        else:
+            iso_scores = np.column_stack([
+                forest_scores("model", keys[j],
+                              [np.c_[resid[a:b, j], rz[a:b, j], lvl_rz[a:b, j]] for a, b in spans],
+                              metric, FEATURES)
+                for j, metric in enumerate(metrics)
+            ])
+
+    outs, scored = [], {}
+    with stage("scoring"):
+        for j, metric in enumerate(metrics):
+            out, scored[metric] = _score_metric(
+                base if n_met == 1 else base.copy(), metric, Y[:, j], resid[:, j], rz[:, j], lvl_rz[:, j],
+                iso_scores[:, j], bounds, iforest_contamination, z_abs_threshold,
+                owner=(blamed == j) if multivariate else None)
+            outs.append(out)
+            if clean is not None and len(clean[0]):
+                both = pd.concat([scored[metric], _clean_scored(clean, metric, j)], ignore_index=True)
+                scored[metric] = both.sort_values("facility", kind="stable").reset_index(drop=True)
+        out = pd.concat(outs, ignore_index=True) if n_met > 1 else outs[0]
+        if n_met > 1:
+            out = out.sort_values(["date", "facility", "metric"]).reset_index(drop=True)
+    prof.count("anomalies", len(out))
+    return out, scored
 
 def detect_anomalies(
     df: pd.DataFrame,
@@ -58,71 +493,22 @@ def detect_anomalies(
     stl_period: int = 7,
     iforest_contamination: float = 0.015,
     z_abs_threshold: float = 3.0,
+    executor: str = "serial",
+    n_workers: int | None = None,
+    chunk_size: int | None = None,
+    cache: bool = True,
+    registry: ModelRegistry | None = None,
+    decomposition: str = "stl",
+    cascade: bool = False,
+    triage_z: float = 4.5,
+    triage_rz: float = TRIAGE_RZ,
+    stats: dict | None = None,
+    pooled: bool = False,
 ):
     assert metric in FRIENDLY
-
-    out_rows, scored_frames = [], []
-
-    for fac, sub in df.sort_values("date").groupby("facility"):
-        y = sub[metric].values.astype(float)
-        resid = _stl_residuals(y, period=stl_period)
-        rz = _rolling_zscore(resid, window=14)
-        lvl_rz = _rolling_zscore(sub[metric].values.astype(float), window=14)
-
-        X = np.c_[resid, rz, lvl_rz]
-        iforest = IsolationForest(n_estimators=200, contamination=iforest_contamination, random_state=42)
-        pred = iforest.fit_predict(X)
-        iso_decision = iforest.decision_function(X)
-        dec_min, dec_max = float(iso_decision.min()), float(iso_decision.max())
-
-        aux_flag = (np.abs(rz) >= z_abs_threshold).astype(int)
-        labels = ((-pred + 1) // 2)
-        labels = ((labels > 0) | (aux_flag > 0)).astype(int)
-
-        sub_scored = sub.copy()
-        sub_scored[f"{metric}_residual"] = resid
-        sub_scored["rolling_z"] = rz
-        sub_scored["level_rolling_z"] = lvl_rz
-        sub_scored["iso_decision"] = iso_decision
-        sub_scored["anomaly_label"] = labels
-
-        # Baselines (last 14 days) for friendlier “why”
-        s_metric = pd.Series(sub[metric].values.astype(float))
-        base_mean = s_metric.rolling(14, min_periods=7).mean().fillna(method="bfill").values
-        base_median = s_metric.rolling(14, min_periods=7).median().fillna(method="bfill").values
-
-        resid_mad = _mad(resid) if len(resid) else 0.0
-        p_list, s_list, c_list, why_list = [], [], [], []
-        for i, (az, r, d, val) in enumerate(zip(np.abs(rz), resid, iso_decision, s_metric.values)):
-            pr, ps, cf = _priority_and_confidence(az, r, resid_mad, d, dec_min, dec_max)
-            p_list.append(pr); s_list.append(ps); c_list.append(cf)
-            bm, bmed = base_mean[i], base_median[i]
-            diff = val - bmed
-            why = (
-                f"Unusual vs recent pattern (|Z|={az:.2f}). "
-                f"Median≈{bmed:,.2f}, Avg≈{bm:,.2f}, Diff≈{diff:+,.2f}. Residual={r:.1f}."
-            )
-            why_list.append(why)
-
-        sub_scored["priority"] = p_list
-        sub_scored["priority_score"] = s_list
-        sub_scored["confidence"] = c_list
-        sub_scored["why_text"] = why_list
-
-        scored_frames.append(sub_scored)
-
-        if labels.any():
-            anomalies = sub_scored.loc[labels == 1, ["date", "facility", metric,
-                                                     f"{metric}_residual", "rolling_z",
-                                                     "iso_decision", "priority", "priority_score",
-                                                     "confidence", "why_text"]].copy()
-            anomalies["metric"] = metric
-            out_rows.append(anomalies)
-
-    scored = pd.concat(scored_frames, ignore_index=True) if scored_frames else df.copy()
-    out = pd.concat(out_rows, ignore_index=True) if out_rows else pd.DataFrame(columns=[
-        "date","facility",metric,f"{metric}_residual","rolling_z","iso_decision","priority",
-        "priority_score","confidence","why_text","metric"
-    ])
-    out = out.sort_values(["date","facility"]).reset_index(drop=True)
-    return out, scored
+    out, scored = detect_anomalies_multi(
+        df, [metric], stl_period=stl_period, iforest_contamination=iforest_contamination,
+        z_abs_threshold=z_abs_threshold, registry=registry, executor=executor, n_workers=n_workers,
+        chunk_size=chunk_size, cache=cache, decomposition=decomposition, cascade=cascade,
+        triage_z=triage_z, triage_rz=triage_rz, stats=stats, pooled=pooled)
+    return out, scored[metric]
@@ -0,0 +1,178 @@
+# src/profiling.py
+from __future__ import annotations
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
+Hook = Callable[[dict], None]
+
+_HOOKS: list[Hook] = []
+_CURRENT: ContextVar["ScanProfile | None"] = ContextVar("scan_profile", default=None)
+
+log = logging.getLogger("anomaly_guard.perf")
+
+class ScanProfile:
+    """Where one scan's time went: self-time per stage, time per facility and counters.
+
+    Stages nest; a stage's time excludes its child stages, so the breakdown adds up
+    to the wall time spent inside stages. Every stage exit and the final summary are
+    passed to the registered hooks as event dicts.
+    """
+
+    def __init__(self, label: str = "scan"):
+        self.label = label
+        self.stages: dict[str, float] = {}
+        self.facility_seconds: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self._stack: list[list] = []
+        self._t0 = time.perf_counter()
+        self.wall_s: float | None = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        frame = [name, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            total = time.perf_counter() - frame[1]
+            self.stages[name] = self.stages.get(name, 0.0) + total - frame[2]
+            if self._stack:
+                self._stack[-1][2] += total
+            _emit(dict(event="stage", scan=self.label, stage=name, seconds=round(total, 6)))
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def add_facility_time(self, facility: str, seconds: float):
+        self.facility_seconds[facility] = self.facility_seconds.get(facility, 0.0) + seconds
+
+    def slowest(self, n: int = 10) -> list[tuple[str, float]]:
+        return sorted(self.facility_seconds.items(), key=lambda kv: kv[1], reverse=True)[:n]
+
+    def to_dict(self, top: int = 10) -> dict[str, Any]:
+        return dict(label=self.label, wall_s=round(self.wall_s or time.perf_counter() - self._t0, 6),
+                    stages={k: round(v, 6) for k, v in self.stages.items()},
+                    counters=dict(self.counters),
+                    slowest_facilities=[dict(facility=f, seconds=round(s, 6)) for f, s in self.slowest(top)])
+
+@contextmanager
+def profiling(label: str = "scan") -> Iterator[ScanProfile]:
+    """Profile everything run inside the block; nested calls join the outer profile."""
+    outer = _CURRENT.get()
+    if outer is not None:
+        yield outer
+        return
+    prof = ScanProfile(label)
+    token = _CURRENT.set(prof)
+    try:
+        yield prof
+    finally:
+        _CURRENT.reset(token)
+        prof.wall_s = time.perf_counter() - prof._t0
+        _emit(dict(event="scan", **prof.to_dict()))
+
+def current_profile() -> ScanProfile | None:
+    return _CURRENT.get()
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage of the active profile (no-op when nothing is being profiled)."""
+    prof = _CURRENT.get()
+    if prof is None:
+        yield
+    else:
+        with prof.stage(name):
+            yield
+
+def add_hook(hook: Hook) -> Hook:
+    if hook not in _HOOKS:
+        _HOOKS.append(hook)
+    return hook
+
+def remove_hook(hook: Hook):
+    if hook in _HOOKS:
+        _HOOKS.remove(hook)
+
+def log_hook(event: dict):
+    """Structured log line per event (JSON on the anomaly_guard.perf logger)."""
+    log.info(json.dumps(event, default=str))
+
+def structured_logs(on: bool = True):
+    """Switch the JSON timing lines (log_hook → stderr) on or off for this process."""
+    if not on:
+        remove_hook(log_hook)
+        return
+    if not log.handlers:
+        log.addHandler(logging.StreamHandler())
+        log.propagate = False
+    log.setLevel(logging.INFO)
+    add_hook(log_hook)
+
+def _emit(event: dict):
+    for hook in list(_HOOKS):
+        try:
+            hook(event)
+        except Exception:  # instrumentation must never break a scan
+            log.exception("profiling hook %r failed", hook)
+
+def timed_call(fn, item):
+    """(fn(item), seconds); module-level so it pickles for the process executor."""
+    t0 = time.perf_counter()
+    result = fn(item)
+    return result, time.perf_counter() - t0
+
+def profiled(label: str):
+    """Decorator: run the function inside `profiling(label)` (joining an outer profile if any)."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with profiling(label):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+class PeakRSS:
+    """Samples resident set size on a background thread while the block runs."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start = self.peak = self._rss()
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _rss() -> int:
+        try:
+            with open("/proc/self/statm") as fh:
+                return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            import resource  # POSIX only
+            # lifetime peak (KiB on Linux, bytes on macOS) — coarse but portable
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return rss if sys.platform == "darwin" else rss * 1024
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._rss())
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+    @property
+    def delta_mb(self) -> float:
+        return (self.peak - self.start) / 2**20
@@ -0,0 +1,114 @@
+# src/registry.py
+from __future__ import annotations
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import joblib
+import numpy as np
+import sklearn
+from sklearn.ensemble import IsolationForest
+
+FEATURES = ["residual", "rolling_z", "level_rolling_z"]
+
+class ModelRegistry:
+    """Fitted per-facility IsolationForests on local disk, with their training metadata.
+
+    Layout: <root>/<metric>/<facility>.joblib next to <facility>.json. A saved model is
+    reused while its params and feature schema match, it is younger than <max_age_days>
+    and the features being scored have not drifted from what it was trained on: no
+    feature's mean moved more than <drift_tol> training standard deviations, and no
+    feature's interquartile range changed by more than a factor of <scale_tol>.
+    """
+
+    def __init__(self, root: str | os.PathLike = ".models", max_age_days: float = 30.0,
+                 drift_tol: float = 0.5, scale_tol: float = 1.5):
+        self.root = Path(root)
+        self.max_age_days = max_age_days
+        self.drift_tol = drift_tol
+        self.scale_tol = scale_tol
+
+    def _paths(self, facility: str, metric: str) -> tuple[Path, Path]:
+        safe = re.sub(r"[^A-Za-z0-9_.+-]", "_", facility)
+        folder = self.root / re.sub(r"[^A-Za-z0-9_.+-]", "_", metric)
+        return folder / f"{safe}.joblib", folder / f"{safe}.json"
+
+    def metadata(self, facility: str, metric: str) -> dict[str, Any] | None:
+        _, meta_path = self._paths(facility, metric)
+        try:
+            return json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def stale_reason(self, meta: dict[str, Any] | None, params: dict[str, Any],
+                     features: list[str], X: np.ndarray) -> str | None:
+        """Why a saved model can't be reused for <X> (None when it can)."""
+        if meta is None:
+            return "missing"
+        if meta.get("params") != params or meta.get("features") != features:
+            return "params"
+        fitted_at = datetime.fromisoformat(meta["fitted_at"])
+        if (datetime.now(timezone.utc) - fitted_at).total_seconds() > self.max_age_days * 86400:
+            return "age"
+        mean, std = np.asarray(meta["feature_mean"]), np.asarray(meta["feature_std"])
+        shift = np.abs(X.mean(axis=0) - mean) / np.where(std > 1e-9, std, 1.0)
+        if shift.max() > self.drift_tol:
+            return "drift"
+        # the features are centered by construction, so a noisier series shows up only in
+        # their spread; the IQR ignores the few anomalies a new month may bring
+        if "feature_iqr" in meta:
+            iqr = np.maximum(np.asarray(meta["feature_iqr"]), 1e-9)
+            scale = np.maximum(_iqr(X), 1e-9) / iqr
+            if np.maximum(scale, 1.0 / scale).max() > self.scale_tol:
+                return "drift"
+        return None
+
+    def load(self, facility: str, metric: str, params: dict[str, Any], features: list[str],
+             X: np.ndarray) -> IsolationForest | None:
+        model_path, _ = self._paths(facility, metric)
+        if self.stale_reason(self.metadata(facility, metric), params, features, X) is not None:
+            return None
+        try:
+            return joblib.load(model_path)
+        except (OSError, EOFError, ValueError):
+            return None
+
+    def save(self, facility: str, metric: str, model: IsolationForest, params: dict[str, Any],
+             features: list[str], X: np.ndarray, window: tuple[str, str]):
+        model_path, meta_path = self._paths(facility, metric)
+        model_path.parent.mkdir(parents=True, exist_ok=True)
+        meta = dict(
+            facility=facility, metric=metric, params=params, features=features,
+            window=dict(start=window[0], end=window[1], rows=int(len(X))),
+            fitted_at=datetime.now(timezone.utc).isoformat(),
+            feature_mean=X.mean(axis=0).tolist(), feature_std=X.std(axis=0).tolist(),
+            feature_iqr=_iqr(X).tolist(),
+            sklearn=sklearn.__version__,
+        )
+        # Write-then-rename so concurrent scans never read a half-written model
+        _atomic_write(model_path, lambda fh: joblib.dump(model, fh))
+        _atomic_write(meta_path, lambda fh: fh.write(json.dumps(meta, indent=2).encode()))
+
+    def clear(self):
+        for path in self.root.glob("*/*"):
+            if path.suffix in (".joblib", ".json"):
+                path.unlink()
+
+def _iqr(X: np.ndarray) -> np.ndarray:
+    q25, q75 = np.percentile(X, [25, 75], axis=0)
+    return q75 - q25
+
+def _atomic_write(path: Path, write):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            write(fh)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
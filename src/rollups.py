@@ -0,0 +1,152 @@
+# src/rollups.py
+from __future__ import annotations
+import copy
+import threading
+
+import numpy as np
+import pandas as pd
+
+PRIORITIES = ["High", "Medium", "Low"]
+_COUNTS = [p.lower() for p in PRIORITIES]
+
+class PortfolioRollups:
+    """Daily per-facility and portfolio aggregates of one metric and its alerts.
+
+    Tables (all kept sorted by date):
+      facility_daily   date, facility, value, high, medium, low
+      portfolio_daily  date → facilities, value_sum, value_mean, high, medium, low, alerts
+      facility_totals  facility → rows, high, medium, low, alerts
+
+    `update` is incremental: a dataset that extends the previous one only aggregates the
+    new days, and a new scan applies the difference between the old and new alert
+    counts per (date, facility, priority). Reads touch only the requested date window
+    and facilities, so they don't grow with the length of the history.
+
+    Updates replace the tables instead of writing into them, so a `snapshot` is a
+    cheap, consistent view that later updates (from other sessions) never change.
+    """
+
+    def __init__(self, metric: str):
+        self.metric = metric
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.version: str | None = None
+        self.scan: str | None = None
+        self.facility_daily = pd.DataFrame(columns=["date", "facility", "value"] + _COUNTS)
+        self.portfolio_daily = pd.DataFrame(columns=["facilities", "value_sum", "value_mean"] + _COUNTS + ["alerts"])
+        self.facility_totals = pd.DataFrame(0, index=pd.Index([], dtype=object, name="facility"),
+                                            columns=["rows"] + _COUNTS + ["alerts"], dtype="int64")
+        # (date, facility, priority) → n, for the scan the tables currently reflect
+        self._alert_counts = pd.Series(dtype="int64", index=pd.MultiIndex.from_arrays(
+            [[], [], []], names=["date", "facility", "priority"]))
+
+    # ── maintenance ──
+    def update(self, df: pd.DataFrame, version: str, anomalies: pd.DataFrame | None = None,
+               scan: str | None = None) -> "PortfolioRollups":
+        with self._lock:
+            if version != self.version:
+                self._update_values(df)
+                self.version = version
+            if anomalies is not None and scan != self.scan:
+                self._update_alerts(anomalies)
+                self.scan = scan
+        return self
+
+    def snapshot(self) -> "PortfolioRollups":
+        """The current tables as an independent object; it shares them until either side updates."""
+        with self._lock:
+            snap = copy.copy(self)
+        snap._lock = threading.Lock()
+        return snap
+
+    def _update_values(self, df: pd.DataFrame):
+        last = self.facility_daily["date"].max() if len(self.facility_daily) else None
+        facilities = set(df["facility"].astype(str).unique())
+        extends = (last is not None and df["date"].min() == self.facility_daily["date"].min()
+                   and df["date"].max() >= last and facilities == set(self.facility_totals.index))
+        if extends:
+            new = df[df["date"] > last]
+        else:
+            # unrelated dataset: start over (alerts are re-applied by the next scan)
+            new = df
+            self._reset()
+        if new.empty:
+            return
+        rows = pd.DataFrame({"date": new["date"].to_numpy(), "facility": new["facility"].astype(str).to_numpy(),
+                             "value": new[self.metric].to_numpy(dtype=float)})
+        for c in _COUNTS:
+            rows[c] = 0
+        rows = rows.sort_values(["date", "facility"], kind="stable")
+        self.facility_daily = pd.concat([self.facility_daily, rows], ignore_index=True) \
+            if len(self.facility_daily) else rows.reset_index(drop=True)
+
+        day = rows.groupby("date")["value"].agg(facilities="count", value_sum="sum", value_mean="mean")
+        for c in _COUNTS + ["alerts"]:
+            day[c] = 0
+        self.portfolio_daily = pd.concat([self.portfolio_daily, day]) if len(self.portfolio_daily) else day
+
+        per_fac = rows.groupby("facility").size().rename("rows")
+        totals = self.facility_totals.reindex(self.facility_totals.index.union(per_fac.index), fill_value=0)
+        totals = totals.assign(rows=totals["rows"] + per_fac.reindex(totals.index, fill_value=0))
+        self.facility_totals = totals.astype("int64")
+
+    def _update_alerts(self, anomalies: pd.DataFrame):
+        new = anomalies.groupby([anomalies["date"], anomalies["facility"].astype(str),
+                                 anomalies["priority"].astype(str)]).size()
+        new.index.names = ["date", "facility", "priority"]
+        delta = new.sub(self._alert_counts, fill_value=0)
+        delta = delta[delta != 0].astype("int64")
+        self._alert_counts = new
+        if delta.empty:
+            return
+        wide = delta.unstack("priority", fill_value=0).reindex(columns=PRIORITIES, fill_value=0)
+        wide.columns = _COUNTS
+        wide = wide.reset_index()
+        # alerts on days the value tables don't cover (shouldn't happen) are dropped
+        keys = pd.MultiIndex.from_frame(self.facility_daily[["date", "facility"]])
+        pos = keys.get_indexer(pd.MultiIndex.from_frame(wide[["date", "facility"]]))
+        wide = wide[pos >= 0]
+        pos = pos[pos >= 0]
+        # new tables, not in-place writes: snapshots may still be reading the old ones
+        daily = self.facility_daily.copy()
+        cols = [daily.columns.get_loc(c) for c in _COUNTS]
+        counts = daily.iloc[pos, cols].to_numpy() + wide[_COUNTS].to_numpy()
+        for j, c in enumerate(cols):
+            daily.iloc[pos, c] = counts[:, j]
+
+        by_day = wide.groupby("date")[_COUNTS].sum()
+        portfolio = self.portfolio_daily.copy()
+        portfolio.loc[by_day.index, _COUNTS] += by_day.to_numpy()
+        portfolio.loc[by_day.index, "alerts"] += by_day.sum(axis=1).to_numpy()
+        by_fac = wide.groupby("facility")[_COUNTS].sum()
+        totals = self.facility_totals.copy()
+        totals.loc[by_fac.index, _COUNTS] += by_fac.to_numpy()
+        totals.loc[by_fac.index, "alerts"] += by_fac.sum(axis=1).to_numpy()
+        self.facility_daily, self.portfolio_daily, self.facility_totals = daily, portfolio, totals
+
+    # ── reads ──
+    @property
+    def latest(self) -> pd.Timestamp | None:
+        return self.portfolio_daily.index.max() if len(self.portfolio_daily) else None
+
+    def totals(self, facilities: list[str] | None = None) -> pd.Series:
+        """rows / alerts / per-priority counts over the whole history, summed over <facilities>."""
+        t = self.facility_totals if not facilities else self.facility_totals.reindex([str(f) for f in facilities])
+        return t.sum().astype("int64")
+
+    def window(self, days: int, facilities: list[str] | None = None) -> pd.DataFrame:
+        """facility_daily rows of the last <days> days (ending at `latest`), for <facilities>."""
+        if self.latest is None:
+            return self.facility_daily
+        dates = self.facility_daily["date"].to_numpy()
+        start = np.searchsorted(dates, np.datetime64(self.latest - pd.Timedelta(days=days)), side="left")
+        recent = self.facility_daily.iloc[start:]
+        return recent[recent["facility"].isin([str(f) for f in facilities])] if facilities else recent
+
+    def alerts_by_facility(self, days: int, facilities: list[str] | None = None) -> pd.DataFrame:
+        """facility, high, medium, low, alerts over the last <days> days; facilities without alerts omitted."""
+        counts = self.window(days, facilities).groupby("facility")[_COUNTS].sum()
+        counts["alerts"] = counts.sum(axis=1)
+        return counts[counts["alerts"] > 0].reset_index()
@@ -0,0 +1,157 @@
+# src/scans.py
+from __future__ import annotations
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable
+
+# fn(progress) -> result, where progress(fraction, message) may be called any number of times
+JobFn = Callable[[Callable[[float, str], None]], Any]
+
+@dataclass
+class ScanJob:
+    id: str
+    label: str
+    fn: JobFn = field(repr=False)
+    key: Hashable | None = None
+    source: str = "manual"
+    describe: Callable[[Any], str] | None = field(default=None, repr=False)
+    status: str = "queued"  # queued -> running -> done | failed
+    progress: float = 0.0
+    message: str = ""
+    result: Any = field(default=None, repr=False)
+    error: str | None = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+class ScanService:
+    """Runs scan jobs on background worker threads, off the Streamlit script thread.
+
+    Jobs are plain callables; the service tracks their status and progress, dedupes
+    identical queued/running work by <key>, and appends a completion event that any
+    session can pick up with `events_since` (only the newest <max_events> are kept, so
+    polling costs the same however long the process runs). `schedule` resubmits a job factory every
+    <interval_s> seconds. Nothing here touches Streamlit state.
+    """
+
+    def __init__(self, n_workers: int = 1, max_jobs: int = 100, max_events: int = 200):
+        self.n_workers = n_workers
+        self.max_jobs = max_jobs
+        self.max_events = max_events
+        self._queue: queue.Queue[ScanJob | None] = queue.Queue()
+        self._jobs: OrderedDict[str, ScanJob] = OrderedDict()
+        self._events: list[dict] = []  # the newest <max_events>, by seq
+        self._seq = 0
+        self._schedules: dict[str, threading.Event] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._workers: list[threading.Thread] = []
+
+    def _start(self):
+        while len(self._workers) < self.n_workers:
+            t = threading.Thread(target=self._work, name=f"scan-worker-{len(self._workers) + 1}", daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    def submit(self, fn: JobFn, label: str, key: Hashable | None = None, source: str = "manual",
+               describe: Callable[[Any], str] | None = None) -> ScanJob:
+        with self._lock:
+            if key is not None:
+                for job in self._jobs.values():
+                    if job.key == key and job.active:
+                        return job
+            job = ScanJob(id=f"scan-{next(self._ids)}", label=label, fn=fn, key=key, source=source,
+                          describe=describe)
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.active:
+                    break
+                self._jobs.popitem(last=False)
+            self._start()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> ScanJob | None:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list[ScanJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def events_since(self, seq: int) -> tuple[list[dict], int]:
+        """Completion events after <seq> (of the newest <max_events>) and the new high-water mark."""
+        with self._lock:
+            if not self._events:
+                return [], self._seq
+            start = max(seq - self._events[0]["seq"] + 1, 0)  # seqs are consecutive
+            return self._events[start:], self._seq
+
+    def wait(self, job_id: str, timeout: float | None = None) -> ScanJob:
+        deadline = None if timeout is None else time.time() + timeout
+        job = self._jobs[job_id]
+        while job.active and (deadline is None or time.time() < deadline):
+            time.sleep(0.05)
+        return job
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job.status, job.started_at = "running", time.time()
+
+            def progress(fraction: float, message: str = ""):
+                job.progress, job.message = min(max(float(fraction), 0.0), 1.0), message
+
+            try:
+                job.result = job.fn(progress)
+                job.status, job.progress = "done", 1.0
+                text = job.describe(job.result) if job.describe else f"{job.label}: done"
+            except Exception as exc:  # a failed scan must not kill the worker
+                job.status, job.error = "failed", f"{type(exc).__name__}: {exc}"
+                text = f"{job.label} failed: {job.error}"
+            job.finished_at = time.time()
+            with self._lock:
+                self._seq += 1
+                self._events.append(dict(seq=self._seq, job_id=job.id, key=job.key,
+                                         source=job.source, status=job.status, text=text))
+                del self._events[:-self.max_events]
+
+    def schedule(self, name: str, interval_s: float, make_job: Callable[[], dict | None]):
+        """Submit `make_job()` (kwargs for `submit`, or None to skip a tick) every <interval_s>."""
+        self.unschedule(name)
+        stop = threading.Event()
+        self._schedules[name] = stop
+
+        def loop():
+            while not stop.wait(interval_s):
+                spec = make_job()
+                if spec is not None:
+                    self.submit(source=f"scheduled:{name}", **spec)
+        threading.Thread(target=loop, name=f"scan-schedule-{name}", daemon=True).start()
+
+    def unschedule(self, name: str):
+        stop = self._schedules.pop(name, None)
+        if stop is not None:
+            stop.set()
+
+    def scheduled(self) -> list[str]:
+        return list(self._schedules)
+
+    def shutdown(self):
+        for name in list(self._schedules):
+            self.unschedule(name)
+        for _ in self._workers:
+            self._queue.put(None)
+        for t in self._workers:
+            t.join()
+        self._workers.clear()
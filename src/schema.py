@@ -0,0 +1,63 @@
+# src/schema.py
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+# Canonical in-memory layout of the facility dataset. float32 keeps ~7 significant
+# digits (cents on revenue up to ~$100k/day); move-ins are whole counts.
+METRIC_DTYPES = {
+    "billed_revenue": "float32",
+    "payment_success_rate": "float32",
+    "move_ins": "int16",
+    "delinquencies": "float32",
+}
+REQUIRED_COLUMNS = ["date", "facility", *METRIC_DTYPES]
+
+class SchemaError(ValueError):
+    pass
+
+def _coerce_metric(s: pd.Series, dtype: str) -> pd.Series:
+    if s.dtype == dtype:
+        return s
+    values = pd.to_numeric(s, errors="coerce")
+    if values.isna().any():
+        raise SchemaError(f"{s.name}: {int(values.isna().sum())} missing or non-numeric values")
+    if np.dtype(dtype).kind == "i":
+        info = np.iinfo(dtype)
+        rounded = values.round()
+        if (rounded != values).any() or rounded.min() < info.min or rounded.max() > info.max:
+            raise SchemaError(f"{s.name}: expected whole numbers in [{info.min}, {info.max}]")
+        values = rounded
+    return values.astype(dtype)
+
+def coerce_dataset(df: pd.DataFrame, facilities: list[str] | None = None) -> pd.DataFrame:
+    """Validate a facility frame and return it in the canonical compact schema.
+
+    Dates become datetime64[ns], facility a categorical (sorted categories, or
+    <facilities> when given), metrics float32/int16. Extra columns pass through.
+    Raises SchemaError on missing columns or values that don't fit.
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise SchemaError(f"missing columns: {missing}")
+
+    date = df["date"]
+    if date.dtype != "datetime64[ns]":
+        date = pd.to_datetime(date, errors="coerce").astype("datetime64[ns]")
+        if date.isna().any():
+            raise SchemaError(f"date: {int(date.isna().sum())} unparseable values")
+
+    fac = df["facility"]
+    cats = sorted(facilities if facilities is not None else fac.astype(str).unique())
+    if not (isinstance(fac.dtype, pd.CategoricalDtype) and list(fac.cat.categories) == cats):
+        fac = pd.Series(pd.Categorical(fac.astype(str), categories=cats), index=df.index, name="facility")
+        if fac.isna().any():
+            raise SchemaError("facility: values outside the known facility list")
+
+    cols = {"date": date, "facility": fac}
+    cols.update({m: _coerce_metric(df[m], dtype) for m, dtype in METRIC_DTYPES.items()})
+    out = pd.DataFrame(cols, index=df.index)
+    for c in df.columns:
+        if c not in out.columns:
+            out[c] = df[c]
+    return out
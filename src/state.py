@@ -3,20 +3,84 @@ from __future__ import annotations
 import streamlit as st
 import pandas as pd
 from typing import Tuple
+from .alerts import AlertStore
 from .data_gen import generate_dataset, extend_dataset
-from .model import detect_anomalies
+from .model import FRIENDLY, detect_anomalies
+from .cache import LRUCache
+from .incremental import IncrementalDetector
+from .profiling import profiling
+from .registry import ModelRegistry
+from .rollups import PortfolioRollups
+from .scans import ScanJob, ScanService
+from .store import DatasetStore
+from .sweep import sweep
 
 DEFAULTS = dict(
     days=210, n_facilities=12, seed=42,
-    stl_period=7, iforest_contamination=0.015, z_abs_threshold=3.0,
-    metric="billed_revenue"
+    stl_period=7, iforest_contamination=0.015, z_abs_threshold=3.0, decomposition="stl",
+    cascade=False, triage_z=4.5, pooled=False,
+    metric="billed_revenue",
+    executor="serial", n_workers=None, incremental=False,
+    reuse_models=True, model_dir=".models", data_dir=".data", dataset_versions=20,
+    result_cache_entries=32, result_cache_mb=512,
+    scan_workers=1, scan_chunks=8,
 )
 
+@st.cache_resource(show_spinner=False)
+def result_cache() -> LRUCache:
+    """Detection results shared by every session in this process."""
+    return LRUCache(max_entries=DEFAULTS["result_cache_entries"],
+                    max_bytes=DEFAULTS["result_cache_mb"] * 2**20)
+
+def configure_result_cache(max_entries: int | None = None, max_mb: float | None = None):
+    result_cache().resize(max_entries=max_entries,
+                          max_bytes=int(max_mb * 2**20) if max_mb is not None else None)
+
+@st.cache_resource(show_spinner=False)
+def dataset_store() -> DatasetStore:
+    """Memory-mapped dataset versions shared by every session in this process."""
+    return DatasetStore(DEFAULTS["data_dir"], keep_versions=DEFAULTS["dataset_versions"])
+
+@st.cache_resource(show_spinner=False)
+def alert_store() -> AlertStore:
+    """Alerts, acknowledgements and tasks shared by every session (SQLite next to the datasets)."""
+    return AlertStore(f"{DEFAULTS['data_dir']}/alerts.sqlite")
+
+@st.cache_resource(show_spinner=False)
+def _rollups() -> LRUCache:
+    # (metric, detection params, dataset version) → PortfolioRollups, shared by every session;
+    # (metric, detection params) → the last one built for those params, to seed the next version
+    return LRUCache(max_entries=2 * DEFAULTS["dataset_versions"])
+
+@st.cache_resource(show_spinner=False)
+def scan_service() -> ScanService:
+    """Background scan workers shared by every session in this process."""
+    return ScanService(n_workers=DEFAULTS["scan_workers"])
+
+@st.cache_resource(show_spinner=False)
+def _scan_schedule() -> dict:
+    # What the process-wide scheduled scan targets: set by the last session that changed it
+    return {}
+
+@st.cache_resource(show_spinner=False)
+def _base_version(days: int, n_facilities: int, seed: int) -> str:
+    # synthetic demo data carries its injected-anomaly labels, so sweeps can score precision
+    # pinned: the version every new session starts from is never pruned
+    return dataset_store().pin(dataset_store().put(
+        generate_dataset(days=days, n_facilities=n_facilities, seed=seed, labels=True)))
+
 def ensure_state():
-    if "df" not in st.session_state:
-        st.session_state.df = generate_dataset(
-            days=DEFAULTS["days"], n_facilities=DEFAULTS["n_facilities"], seed=DEFAULTS["seed"]
-        )
+    # Sessions hold only a version id; st.session_state.df is a reference to the shared,
+    # read-only frame for that version, never a private copy.
+    base = _base_version(DEFAULTS["days"], DEFAULTS["n_facilities"], DEFAULTS["seed"])
+    if "dataset_version" not in st.session_state:
+        st.session_state.dataset_version = base
+    try:
+        st.session_state.df = dataset_store().get(st.session_state.dataset_version)
+    except KeyError:
+        # a long-idle session's advanced-month version was pruned: start over from the base data
+        st.session_state.dataset_version = base
+        st.session_state.df = dataset_store().get(base)
     if "metric" not in st.session_state:
         st.session_state.metric = DEFAULTS["metric"]
     if "params" not in st.session_state:
@@ -24,6 +88,14 @@ def ensure_state():
             stl_period=DEFAULTS["stl_period"],
             iforest_contamination=DEFAULTS["iforest_contamination"],
             z_abs_threshold=DEFAULTS["z_abs_threshold"],
+            decomposition=DEFAULTS["decomposition"],
+            cascade=DEFAULTS["cascade"],
+            triage_z=DEFAULTS["triage_z"],
+            pooled=DEFAULTS["pooled"],
+            executor=DEFAULTS["executor"],
+            n_workers=DEFAULTS["n_workers"],
+            incremental=DEFAULTS["incremental"],
+            reuse_models=DEFAULTS["reuse_models"],
         )
     if "last_run" not in st.session_state:
         st.session_state.last_run = None
@@ -31,25 +103,268 @@ def ensure_state():
         st.session_state.anomalies = pd.DataFrame()
     if "notifications" not in st.session_state:
         st.session_state.notifications = []
-    if "ack" not in st.session_state:
-        st.session_state.ack = set()
+    if "alert_scan" not in st.session_state:
+        st.session_state.alert_scan = None  # alert_store() id of the anomalies on screen
+    elif st.session_state.alert_scan and not alert_store().touch(st.session_state.alert_scan):
+        # newer scans from other sessions pushed ours out of the store: publish it again
+        st.session_state.alert_scan = alert_store().publish(st.session_state.anomalies, st.session_state.metric)
+    if "scan_seq" not in st.session_state:
+        # only completions after this session started concern it
+        st.session_state.scan_seq = scan_service().events_since(0)[1]
+        st.session_state.scan_job = None
+    poll_scans()
 
-def _alert_id(row: pd.Series) -> str:
-    return f"{row['facility']}|{row['metric']}|{row['date']}"
+def _incremental_scan() -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Score only days appended since the last scan; full scan when metric/params change."""
+    params = st.session_state.params
+    det = st.session_state.get("detector")
+    decomposition = params.get("decomposition", DEFAULTS["decomposition"])
+    sig = (st.session_state.metric, int(params["stl_period"]),
+           float(params["iforest_contamination"]), float(params["z_abs_threshold"]), decomposition)
+    if det is None or det.signature != sig:
+        det = IncrementalDetector(
+            st.session_state.metric,
+            stl_period=params["stl_period"],
+            iforest_contamination=params["iforest_contamination"],
+            z_abs_threshold=params["z_abs_threshold"],
+            decomposition=decomposition,
+        )
+        st.session_state.detector = det
+        st.session_state.inc_result = det.fit(st.session_state.df)
+    else:
+        new_out, new_scored = det.update(st.session_state.df)
+        if not new_scored.empty:
+            out, scored = st.session_state.inc_result
+            out = pd.concat([out, new_out], ignore_index=True).sort_values(["date", "facility"])
+            st.session_state.inc_result = (out.reset_index(drop=True),
+                                           pd.concat([scored, new_scored], ignore_index=True))
+    return st.session_state.inc_result
 
 def run_detection(selected_facilities: list[str] | None = None, note_scan: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    df = st.session_state.df
-    if selected_facilities:
-        df = df[df["facility"].isin(selected_facilities)].copy()
-    out, scored = detect_anomalies(
-        df,
+    params = st.session_state.params
+    if params.get("incremental"):
+        with profiling("incremental_scan") as prof:
+            out, scored = _incremental_scan()
+        if selected_facilities:
+            out = out[out["facility"].isin(selected_facilities)].reset_index(drop=True)
+            scored = scored[scored["facility"].isin(selected_facilities)].reset_index(drop=True)
+        return _finish_scan(out, scored, selected_facilities, note_scan, dict(profile=prof.to_dict()))
+
+    key, request = _scan_request(selected_facilities)
+    cached = result_cache().get(key)
+    if cached is not None:
+        out, scored, stats = cached  # shared with other sessions: callers copy before mutating
+        stats = dict(stats, result_cache="hit")
+    else:
+        out, scored, stats = _compute_scan(dataset_store(), **request)
+        result_cache().put(key, (out, scored, stats))
+        stats = dict(stats, result_cache="miss")
+    return _finish_scan(out, scored, selected_facilities, note_scan, stats)
+
+def _scan_request(selected_facilities: list[str] | None) -> tuple[tuple, dict]:
+    """Result-cache key and `_compute_scan` arguments for the session's current scan."""
+    # Content-addressed: dataset versions are content hashes, so same version + facilities
+    # + metric + model params => same result, whichever session asks. Executor settings
+    # change how, not what, so they stay out of the key.
+    params = st.session_state.params
+    reuse = bool(params.get("reuse_models", DEFAULTS["reuse_models"]))
+    decomposition = params.get("decomposition", DEFAULTS["decomposition"])
+    cascade = bool(params.get("cascade", DEFAULTS["cascade"]))
+    triage_z = float(params.get("triage_z", DEFAULTS["triage_z"]))
+    pooled = bool(params.get("pooled", DEFAULTS["pooled"]))
+    version = st.session_state.dataset_version
+    key = (version, tuple(sorted(selected_facilities or ())), st.session_state.metric, int(params["stl_period"]),
+           float(params["iforest_contamination"]), float(params["z_abs_threshold"]), decomposition,
+           cascade and triage_z, pooled, reuse)
+    request = dict(
+        version=version,
+        selected_facilities=selected_facilities,
         metric=st.session_state.metric,
-        stl_period=st.session_state.params["stl_period"],
-        iforest_contamination=st.session_state.params["iforest_contamination"],
-        z_abs_threshold=st.session_state.params["z_abs_threshold"],
+        stl_period=params["stl_period"],
+        iforest_contamination=params["iforest_contamination"],
+        z_abs_threshold=params["z_abs_threshold"],
+        executor=params.get("executor", DEFAULTS["executor"]),
+        n_workers=params.get("n_workers", DEFAULTS["n_workers"]),
+        registry=ModelRegistry(DEFAULTS["model_dir"]) if reuse else None,
+        decomposition=decomposition,
+        cascade=cascade,
+        triage_z=triage_z,
+        pooled=pooled,
     )
-    st.session_state.last_run = {"facilities": selected_facilities or "ALL"}
+    return key, request
+
+def _compute_scan(store: DatasetStore, version: str, selected_facilities: list[str] | None,
+                  progress=None, **kwargs) -> tuple[pd.DataFrame, pd.DataFrame, dict]:
+    """Run detection without touching session state (safe on a worker thread).
+
+    With <progress>, facilities are scanned in DEFAULTS["scan_chunks"] groups and
+    progress(fraction, message) is called after each; per-facility results are the
+    same as one pass, except a pooled model must see every facility at once.
+    The scan's profile (profiling.ScanProfile.to_dict) is returned in stats["profile"].
+    """
+    with profiling("scan") as prof:
+        out, scored, stats = _scan_chunks(store, version, selected_facilities, progress, **kwargs)
+    stats["profile"] = prof.to_dict()
+    return out, scored, stats
+
+def _scan_chunks(store: DatasetStore, version: str, selected_facilities: list[str] | None,
+                 progress=None, **kwargs) -> tuple[pd.DataFrame, pd.DataFrame, dict]:
+    df = store.select(version, selected_facilities)
+    facilities = list(df["facility"].unique())
+    n_chunks = 1
+    if progress is not None and not kwargs.get("pooled"):
+        n_chunks = max(1, min(DEFAULTS["scan_chunks"], len(facilities)))
+    parts = [facilities[i::n_chunks] for i in range(n_chunks)] if n_chunks > 1 else [None]
+    outs, frames, stats = [], [], {}
+    for i, part in enumerate(parts):
+        chunk_stats = {}
+        out, scored = detect_anomalies(df if part is None else df[df["facility"].isin(part)],
+                                       stats=chunk_stats, **kwargs)
+        outs.append(out); frames.append(scored)
+        for k, v in chunk_stats.items():
+            stats[k] = stats.get(k, 0) + v
+        if progress:
+            progress((i + 1) / n_chunks, f"{sum(len(p) for p in parts[:i + 1])}/{len(facilities)} facilities")
+    if len(parts) == 1:
+        return outs[0], frames[0], stats
+    out = pd.concat(outs, ignore_index=True).sort_values(["date", "facility"]).reset_index(drop=True)
+    scored = pd.concat(frames, ignore_index=True).sort_values("facility", kind="stable").reset_index(drop=True)
+    return out, scored, stats
+
+def run_sweep(selected_facilities: list[str] | None, periods: list[int], contaminations: list[float],
+              z_thresholds: list[float], progress=None) -> pd.DataFrame:
+    """Sweep the grid on the current dataset/metric with the session's engine settings.
+
+    Never goes through the model registry: sweep fits stay in the stage cache instead
+    of replacing the saved production forests.
+    """
+    _, request = _scan_request(selected_facilities)
+    for k in ("stl_period", "iforest_contamination", "z_abs_threshold", "registry"):
+        request.pop(k)
+    df = dataset_store().select(request.pop("version"), request.pop("selected_facilities"))
+    with profiling("sweep"):
+        return sweep(df, request.pop("metric"), periods, contaminations, z_thresholds,
+                     progress=progress, **request)
+
+def portfolio_rollups() -> PortfolioRollups:
+    """Rollups of the session's dataset and its last scan, brought up to date incrementally.
+
+    Call right after a full-portfolio `run_detection(None)`: the rollups are shared by
+    every session on the same dataset version with the same metric and detection params.
+    Returns a snapshot, so reads are unaffected by other sessions' updates.
+    """
+    key, _ = _scan_request(None)
+    params_key = key[2:] + (bool(st.session_state.params.get("incremental")),)
+    version = st.session_state.dataset_version
+    rollups = _rollups().get(params_key + (version,))
+    if rollups is None:
+        # a new version usually extends the last one (Advance month): start from its
+        # rollups so only the new days are aggregated (an unrelated one is rebuilt)
+        last = _rollups().get(params_key)
+        rollups = last.snapshot() if last is not None else PortfolioRollups(st.session_state.metric)
+        _rollups().put(params_key + (version,), rollups)
+        _rollups().put(params_key, rollups)
+    rollups.update(st.session_state.df, version, st.session_state.anomalies, st.session_state.alert_scan)
+    return rollups.snapshot()
+
+def _describe_scan(metric: str):
+    return lambda result: f"Scan complete: {result[0].shape[0]} {metric.replace('_',' ').title()} alerts found."
+
+def submit_scan(selected_facilities: list[str] | None = None, note_scan: bool = True) -> ScanJob | None:
+    """Queue a scan on the background service; results land via `poll_scans` on a later run.
+
+    Served synchronously instead (returns None) when the result is already cached or
+    incremental scans are on, since both are fast.
+    """
+    key, request = _scan_request(selected_facilities)
+    if st.session_state.params.get("incremental") or key in result_cache():
+        run_detection(selected_facilities, note_scan=note_scan)
+        return None
+    cache, store = result_cache(), dataset_store()
+
+    def scan(progress):
+        result = _compute_scan(store, progress=progress, **request)
+        cache.put(key, result)
+        return result
+
+    job = scan_service().submit(scan, label=f"{FRIENDLY[request['metric']]} scan", key=key,
+                                describe=_describe_scan(request["metric"]))
+    st.session_state.scan_job = dict(id=job.id, facilities=selected_facilities, note_scan=note_scan)
+    return job
+
+def current_scan() -> ScanJob | None:
+    pending = st.session_state.get("scan_job")
+    return scan_service().get(pending["id"]) if pending else None
+
+def poll_scans():
+    """Adopt finished background scans into this session and post their notifications."""
+    events, st.session_state.scan_seq = scan_service().events_since(st.session_state.scan_seq)
+    pending = st.session_state.scan_job
+    for event in events:
+        mine = pending is not None and event["job_id"] == pending["id"]
+        scheduled = event["source"].startswith("scheduled") and event["key"] is not None \
+            and event["key"][0] == st.session_state.dataset_version
+        if not (mine or scheduled):
+            continue
+        if event["status"] == "done" and (mine or event["key"] == _scan_request(None)[0]):
+            job = scan_service().get(event["job_id"])
+            if job is not None:
+                out, scored, stats = job.result
+                _finish_scan(out, scored, pending["facilities"] if mine else None, False, stats)
+        if event["status"] == "failed" or not mine or pending["note_scan"]:
+            st.session_state.notifications.append(event["text"])
+        if mine:
+            st.session_state.scan_job = pending = None
+    if pending is not None and scan_service().get(pending["id"]) is None:
+        st.session_state.scan_job = None  # evicted from the job history
+
+def scan_schedule() -> dict:
+    """The process-wide scheduled scan: {} when off, else interval_min, metric, key and request."""
+    return dict(_scan_schedule())
+
+def schedule_scans(interval_min: float | None):
+    """Rescan this session's dataset/metric/params (all facilities) every <interval_min>; None/0 stops.
+
+    The schedule is shared by every session, so call this only when a user changes it
+    (e.g. from a widget's on_change), never on every rerun. Its target is set here and
+    follows *Advance month* to the newer version (`_follow_schedule`); each tick scans the
+    current target unless its result is already cached (same content, same result).
+    """
+    service, target = scan_service(), _scan_schedule()
+    if not interval_min:
+        service.unschedule("auto")
+        target.clear()
+        return
+    key, request = _scan_request(None)
+    target.clear()
+    target.update(interval_min=interval_min, metric=request["metric"], key=key, request=request)
+    cache, store = result_cache(), dataset_store()
+
+    def make_job():
+        now = dict(target)  # one consistent read: Advance month may retarget it meanwhile
+        if not now:
+            return None
+        key, request = now["key"], now["request"]
+        if key in cache:
+            return None  # content-addressed: nothing new to scan
+        try:
+            store.get(request["version"])
+        except KeyError:
+            return None  # its version was pruned; wait for a newer one
+
+        def scan(progress):
+            result = _compute_scan(store, progress=progress, **request)
+            cache.put(key, result)
+            return result
+        return dict(fn=scan, label=f"Scheduled {FRIENDLY[request['metric']]} scan", key=key,
+                    describe=_describe_scan(request["metric"]))
+    service.schedule("auto", interval_min * 60, make_job)
+
+def _finish_scan(out: pd.DataFrame, scored: pd.DataFrame, selected_facilities: list[str] | None,
+                 note_scan: bool, stats: dict | None = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    st.session_state.last_run = {"facilities": selected_facilities or "ALL", "stats": stats or {}}
     st.session_state.anomalies = out
+    st.session_state.alert_scan = alert_store().publish(out, st.session_state.metric)
 
     # Notifications
     if note_scan:
@@ -58,5 +373,16 @@ def run_detection(selected_facilities: list[str] | None = None, note_scan: bool
         )
     return out, scored
 
+def _follow_schedule(parent: str, version: str):
+    # a schedule on the dataset a month was just added to moves on to the new version
+    target = _scan_schedule()
+    key, request = target.get("key"), target.get("request")
+    if key is not None and key[0] == parent:
+        target.update(key=(version,) + key[1:], request=dict(request, version=version))
+
 def advance_one_month(seed: int | None = None):
-    st.session_state.df = extend_dataset(st.session_state.df, days=30, seed=seed)
+    parent = st.session_state.dataset_version
+    version = dataset_store().put(extend_dataset(st.session_state.df, days=30, seed=seed))
+    _follow_schedule(parent, version)
+    st.session_state.dataset_version = version
+    st.session_state.df = dataset_store().get(version)
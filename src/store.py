@@ -0,0 +1,99 @@
+# src/store.py
+from __future__ import annotations
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from .cache import LRUCache, fingerprint_frame
+from .schema import coerce_dataset
+
+class DatasetStore:
+    """Content-addressed dataset versions kept as Arrow IPC files and memory-mapped.
+
+    `put` writes a frame once (its version is a content hash) and `get` returns a
+    pandas view over the mapped file. Numeric and date columns are zero-copy and
+    read-only, and one frame per version is shared by every caller in the process,
+    so a session only needs to hold the version string.
+
+    Files are pruned least-recently-used first (by mtime, which `put` and `get`
+    refresh) once more than <keep_versions> exist; `pin`ned versions are never removed.
+    """
+
+    def __init__(self, root: str | os.PathLike = ".data", max_open: int = 8, keep_versions: int = 20):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.keep_versions = keep_versions
+        self.pinned: set[str] = set()
+        self._frames = LRUCache(max_entries=max_open)
+
+    def pin(self, version: str) -> str:
+        self.pinned.add(version)
+        return version
+
+    def path(self, version: str) -> Path:
+        return self.root / f"{version}.arrow"
+
+    def put(self, df: pd.DataFrame) -> str:
+        df = coerce_dataset(df).reset_index(drop=True)
+        version = fingerprint_frame(df)
+        path = self.path(version)
+        if not path.exists():
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            fd, tmp = tempfile.mkstemp(dir=self.root, prefix=f".{version}.")
+            os.close(fd)
+            try:
+                with pa.OSFile(tmp, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+            self.prune(keep=(version,))
+        else:
+            self._touch(version)
+        return version
+
+    def get(self, version: str) -> pd.DataFrame:
+        """The frame of <version>; KeyError once its file has been pruned and it isn't open."""
+        self._touch(version)
+        return self._frames.get_or_compute(version, lambda: self._load(version))
+
+    def _touch(self, version: str):
+        try:
+            os.utime(self.path(version))
+        except FileNotFoundError:
+            if version not in self._frames:
+                raise KeyError(f"unknown dataset version {version!r}") from None
+
+    def prune(self, keep: tuple[str, ...] = ()) -> list[str]:
+        """Delete the least recently used versions beyond <keep_versions>; returns them."""
+        files = []
+        for path in self.root.glob("*.arrow"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                pass  # pruned by another process
+        files.sort(reverse=True)
+        protected = self.pinned | set(keep)
+        removed = []
+        for _, path in files[self.keep_versions:]:
+            if path.stem in protected:
+                continue
+            try:
+                path.unlink()  # open mappings stay valid until their frame is dropped
+            except OSError:
+                continue
+            removed.append(path.stem)
+        return removed
+
+    def _load(self, version: str) -> pd.DataFrame:
+        table = ipc.open_file(pa.memory_map(str(self.path(version)), "r")).read_all()
+        return table.to_pandas(split_blocks=True)
+
+    def select(self, version: str, facilities: list[str] | None = None) -> pd.DataFrame:
+        df = self.get(version)
+        return df[df["facility"].isin(facilities)] if facilities else df
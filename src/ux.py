@@ -18,6 +18,10 @@ def us_date(value) -> str:
     d = pd.to_datetime(value)
     return d.strftime("%m/%d/%Y")
 
+def us_dates(dates: pd.Series) -> pd.Series:
+    """Vectorized us_date for a datetime64 column."""
+    return pd.to_datetime(dates).dt.strftime("%m/%d/%Y")
+
 def friendly_metric(metric_key: str) -> str:
     return FRIENDLY.get(metric_key, metric_key.replace("_", " ").title())
 
@@ -0,0 +1,77 @@
+import threading
+from src.alerts import AlertStore
+from src.data_gen import generate_dataset
+from src.model import detect_anomalies
+
+def test_publish_query_ack_and_tasks(tmp_path):
+    df = generate_dataset(days=120, n_facilities=4, seed=3)
+    anomalies, _ = detect_anomalies(df, "billed_revenue")
+    store = AlertStore(tmp_path / "alerts.sqlite")
+    scan = store.publish(anomalies, "billed_revenue")
+    assert store.publish(anomalies.copy(), "billed_revenue") == scan  # content-addressed
+
+    everything = store.query(scan)
+    assert len(everything) == len(anomalies) and not everything["acked"].any()
+    assert {"billed_revenue", "billed_revenue_residual", "why_text", "alert_id"} <= set(everything.columns)
+    fac, start = "FAC-002", anomalies["date"].median()
+    some = store.query(scan, facilities=[fac], start=start, order="Newest")
+    expected = anomalies[(anomalies["facility"] == fac) & (anomalies["date"] >= start)]
+    assert len(some) == len(expected) and some["date"].is_monotonic_decreasing
+
+    row = everything.iloc[0]
+    store.acknowledge(row["facility"], "billed_revenue", row["date"])
+    # another thread (another Streamlit session) sees the ack on its own connection
+    seen = []
+    t = threading.Thread(target=lambda: seen.append(len(AlertStore(store.path).query(scan))))
+    t.start(); t.join()
+    assert seen == [len(anomalies) - 1]
+    assert store.query(scan, acked=True)["alert_id"].tolist() == [row["alert_id"]]
+    store.acknowledge(row["facility"], "billed_revenue", row["date"], on=False)
+    assert len(store.query(scan)) == len(anomalies)
+
+    task = store.add_task(row["facility"], "billed_revenue", row["date"], "Check deposit", due="2025-03-01")
+    assert store.tasks(metric="billed_revenue")["id"].tolist() == [task]
+    store.set_task_status(task, "done")
+    assert store.tasks().empty and len(store.tasks(status=None)) == 1
+
+def test_count_and_pages(tmp_path):
+    df = generate_dataset(days=150, n_facilities=5, seed=5)
+    anomalies, _ = detect_anomalies(df, "billed_revenue")
+    store = AlertStore(tmp_path / "alerts.sqlite")
+    scan = store.publish(anomalies, "billed_revenue")
+    counts = store.count(scan)
+    assert counts["total"] == len(anomalies)
+    assert counts["High"] == int((anomalies["priority"] == "High").sum())
+
+    full = store.query(scan)["alert_id"].tolist()
+    pages = [store.query(scan, limit=4, offset=o)["alert_id"].tolist() for o in range(0, len(full), 4)]
+    assert sum(pages, []) == full  # pages tile the sorted result
+
+    row = store.query(scan, limit=1).iloc[0]
+    store.acknowledge(row["facility"], "billed_revenue", row["date"])
+    assert store.count(scan)["total"] == len(anomalies) - 1
+    assert store.count(scan, acked=None)["total"] == len(anomalies)
+
+def test_old_scans_are_pruned(tmp_path):
+    df = generate_dataset(days=90, n_facilities=2, seed=4)
+    store = AlertStore(tmp_path / "alerts.sqlite", keep_scans=2)
+    scans = [store.publish(detect_anomalies(df, "move_ins", z_abs_threshold=z)[0], "move_ins") for z in (2.0, 2.5, 3.0)]
+    assert len(set(scans)) == 3
+    kept = [s for s in scans if store._conn().execute("SELECT 1 FROM scans WHERE scan = ?", (s,)).fetchone()]
+    assert len(kept) == 2
+
+def test_scan_in_use_outlives_newer_scans(tmp_path):
+    df = generate_dataset(days=90, n_facilities=2, seed=4)
+    store = AlertStore(tmp_path / "alerts.sqlite", keep_scans=2)
+    store.TOUCH_EVERY_S = 0.0
+    mine = store.publish(detect_anomalies(df, "move_ins")[0], "move_ins")
+    total = store.count(mine)["total"]
+    for z in (2.0, 2.5, 3.5):
+        store.publish(detect_anomalies(df, "move_ins", z_abs_threshold=z)[0], "move_ins")
+        assert store.count(mine)["total"] == total  # reading it keeps it among the newest
+    assert len(store.query(mine)) == total
+
+    for z in (2.0, 2.5):
+        store.publish(detect_anomalies(df, "move_ins", z_abs_threshold=z)[0], "move_ins")
+    # pruned once unused: reads come back empty rather than raising
+    assert store.count(mine)["total"] == 0 and store.query(mine).empty
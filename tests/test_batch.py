@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+from src.batch import facility_chunks, score_file
+from src.data_gen import generate_dataset, write_parquet
+from src.model import detect_anomalies
+
+def test_chunked_file_scoring_matches_in_memory(tmp_path):
+    src = tmp_path / "in.parquet"
+    write_parquet(str(src), days=60, n_facilities=5, seed=3, chunk_facilities=5)
+    summary = score_file(src, tmp_path / "out.csv", scored_out=tmp_path / "scored.parquet",
+                         chunk_facilities=2, batch_rows=70)
+    assert (summary["chunks"], summary["facilities"], summary["rows"]) == (3, 5, 300)
+    got = pd.read_csv(tmp_path / "out.csv", parse_dates=["date"])
+    want, _ = detect_anomalies(pd.read_parquet(src), metric="billed_revenue", cache=False)
+    assert len(got) == summary["anomalies"] == len(want)
+    assert sorted(zip(got["facility"], got["date"])) == sorted(zip(want["facility"].astype(str), want["date"]))
+    assert len(pd.read_parquet(tmp_path / "scored.parquet")) == 300
+
+def test_ungrouped_input_is_rejected():
+    df = generate_dataset(days=10, n_facilities=3, seed=1).sort_values("date")
+    with pytest.raises(ValueError):
+        list(facility_chunks([df.iloc[:15], df.iloc[15:]], chunk_facilities=2))
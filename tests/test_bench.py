@@ -0,0 +1,14 @@
+from src.bench import compare, run_case
+
+def test_compare_flags_only_slowdowns_beyond_tolerance():
+    baseline = [dict(case="m/12fac/90d", wall_s=1.0, stages_s=dict(stl=0.5, iforest_fit=0.4))]
+    results = [dict(case="m/12fac/90d", wall_s=1.1, stages_s=dict(stl=0.9, iforest_fit=0.3)),
+                dict(case="m/100fac/90d", wall_s=9.0, stages_s=dict(stl=5.0))]
+    regressions = compare(results, baseline, tolerance=0.2)
+    assert [(r["case"], r["timing"]) for r in regressions] == [("m/12fac/90d", "stages_s.stl")]
+
+def test_cases_record_the_pipeline_stages():
+    r = run_case(3, 60, "billed_revenue")
+    assert {"decomposition", "rolling_z", "forest", "explanations", "scoring"} <= set(r["stages_s"])
+    assert sum(r["stages_s"].values()) <= r["wall_s"] * 1.01 and r["rows"] == 180
+    assert compare([r], [r]) == []
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+from src.cache import LRUCache, fingerprint_frame
+
+def test_lru_evicts_oldest_and_counts():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1          # refresh "a"
+    cache.put("c", 3)                   # evicts "b"
+    assert cache.get("b") is None
+    assert cache.stats() == dict(entries=2, bytes=0, hits=1, misses=1, evictions=1)
+
+def test_lru_byte_bound():
+    cache = LRUCache(max_entries=10, max_bytes=1000)
+    cache.put("x", np.zeros(100))       # 800 bytes
+    cache.put("y", np.zeros(50))        # 400 bytes -> pushes "x" out
+    assert "x" not in cache and "y" in cache
+    assert cache.nbytes == 400
+
+def test_fingerprint_frame_is_content_addressed():
+    df = pd.DataFrame({"facility": ["A", "B"], "v": [1.0, 2.0]})
+    same = df.copy()
+    same.index = [10, 11]
+    assert fingerprint_frame(df) == fingerprint_frame(same)
+    changed = df.assign(v=[1.0, 2.5])
+    assert fingerprint_frame(df) != fingerprint_frame(changed)
@@ -0,0 +1,33 @@
+import numpy as np
+import plotly.graph_objects as go
+from src.charts import lttb_indices, minmax_indices, portfolio_figure
+from src.data_gen import generate_dataset
+
+def test_downsamplers_keep_ends_and_extremes():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 300.0)
+    y[4321] = 9.0  # a spike must survive
+    idx = lttb_indices(x, y, 200)
+    assert len(idx) == 200 and idx[0] == 0 and idx[-1] == len(x) - 1 and 4321 in idx
+    assert np.all(np.diff(idx) > 0)
+    mm = minmax_indices(y, 200)
+    assert len(mm) <= 202 and 4321 in mm and y.argmin() in mm
+    assert len(lttb_indices(x[:50], y[:50], 200)) == 50  # short series pass through
+
+def test_figure_switches_to_webgl_then_bands():
+    small = generate_dataset(days=60, n_facilities=3, seed=1)
+    fig = portfolio_figure(small, "billed_revenue")
+    assert len(fig.data) == 3 and all(type(t) is go.Scatter for t in fig.data)
+    assert sum(len(t.x) for t in fig.data) == len(small)  # nothing to drop
+
+    long = generate_dataset(days=1000, n_facilities=12, seed=1)
+    fig = portfolio_figure(long, "billed_revenue", max_points=500)
+    assert all(type(t) is go.Scattergl and len(t.x) <= 500 for t in fig.data)
+    window = portfolio_figure(long, "billed_revenue", window=(long["date"].max() - np.timedelta64(30, "D"), None))
+    assert all(len(t.x) == 31 for t in window.data)  # a narrow window is shown at full resolution
+
+    wide = generate_dataset(days=90, n_facilities=40, seed=2)
+    anomalies = wide.sample(25, random_state=0)
+    fig = portfolio_figure(wide, "billed_revenue", anomalies)
+    assert [t.name for t in fig.data][-2:] == ["median facility", "anomaly"] and len(fig.data) == 4
+    assert len(fig.data[-1].x) == 25
@@ -0,0 +1,33 @@
+import pandas as pd
+from src.data_gen import extend_dataset, generate_dataset, iter_dataset, write_parquet
+from src.schema import METRIC_DTYPES
+
+def test_generate_is_vectorized_and_reproducible():
+    a = generate_dataset(days=40, n_facilities=5, seed=3)
+    b = generate_dataset(days=40, n_facilities=5, seed=3)
+    pd.testing.assert_frame_equal(a, b)
+    assert len(a) == 200 and a.groupby("facility", observed=True).size().eq(40).all()
+    assert a["date"].nunique() == 40 and list(a["facility"].cat.categories)[0] == "FAC-001"
+
+def test_chunked_stream_and_parquet(tmp_path):
+    chunks = list(iter_dataset(days=20, n_facilities=7, seed=1, chunk_facilities=3))
+    assert [c["facility"].nunique() for c in chunks] == [3, 3, 1]
+    assert chunks[-1]["facility"].iloc[0] == "FAC-007"
+    path = tmp_path / "portfolio.parquet"
+    assert write_parquet(str(path), days=20, n_facilities=7, seed=1, chunk_facilities=3) == 140
+    back = pd.read_parquet(path)
+    pd.testing.assert_frame_equal(back[list(METRIC_DTYPES)], pd.concat(chunks, ignore_index=True)[list(METRIC_DTYPES)])
+
+def test_labels_mark_injected_days_without_changing_data():
+    plain = generate_dataset(days=40, n_facilities=4, seed=3)
+    labeled = generate_dataset(days=40, n_facilities=4, seed=3, labels=True)
+    pd.testing.assert_frame_equal(plain, labeled.drop(columns="injected"))
+    per_fac = labeled.groupby("facility", observed=True)["injected"].sum()
+    assert per_fac.between(2, 5).all()
+    assert extend_dataset(labeled, days=10, seed=1)["injected"].dtype == bool
+
+def test_parquet_carries_labels_when_asked(tmp_path):
+    path = tmp_path / "labeled.parquet"
+    write_parquet(str(path), days=20, n_facilities=3, seed=1, chunk_facilities=2, labels=True)
+    back = pd.read_parquet(path)
+    assert back["injected"].dtype == bool and back["injected"].sum() >= 6
@@ -0,0 +1,20 @@
+import pandas as pd
+from src.data_gen import generate_dataset
+from src.evaluate import run_config, score_alerts, verdicts
+
+def test_score_alerts_counts_injected_days_per_metric():
+    df = pd.DataFrame(dict(date=pd.to_datetime(["2025-01-01", "2025-01-02", "2025-01-03"]),
+                           facility=["FAC-001"] * 3, injected=[True, False, True]))
+    alerts = pd.DataFrame(dict(date=pd.to_datetime(["2025-01-01", "2025-01-02"]), facility=["FAC-001"] * 2))
+    s = score_alerts(alerts, df, ["billed_revenue"])
+    assert (s["alerts"], s["true_positives"], s["precision"], s["recall"]) == (2, 1, 0.5, 0.5)
+    assert score_alerts(alerts, df, ["billed_revenue", "move_ins"])["recall"] == 0.25
+
+def test_configs_are_scored_and_judged_against_the_baseline():
+    df = generate_dataset(days=90, n_facilities=3, seed=4, labels=True)
+    results = verdicts([run_config(df, ["billed_revenue"]),
+                        run_config(df, ["billed_revenue"], decomposition="median", pooled=True)])
+    assert [r["config"] for r in results] == ["stl", "median+pooled"]
+    assert all(0 < r["f1"] <= 1 and r["rows_per_s"] > 0 for r in results)
+    assert results[0]["accepted"] and results[0]["f1_delta"] == 0
+    assert verdicts([dict(wall_s=1.0, f1=0.8), dict(wall_s=0.5, f1=0.7)])[1]["accepted"] is False
@@ -0,0 +1,37 @@
+import pandas as pd
+import pyarrow.parquet as pq
+from src import export
+from src.alerts import AlertStore
+from src.data_gen import generate_dataset
+from src.export import US_DATE, export_file, write_chunks
+from src.model import detect_anomalies
+
+def test_chunked_csv_matches_one_shot(tmp_path):
+    df = generate_dataset(days=60, n_facilities=3, seed=2)
+    cols = ["date", "facility", "billed_revenue"]
+    rows = write_chunks(export.iter_chunks(df, chunk_rows=7), tmp_path / "out.csv", columns=cols)
+    assert rows == len(df)
+    expected = df[cols].assign(date=df["date"].dt.strftime(US_DATE))
+    expected["facility"] = expected["facility"].astype(str)
+    assert (tmp_path / "out.csv").read_text() == expected.to_csv(index=False)
+
+def test_parquet_keeps_timestamps_and_files_expire(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_DIR", tmp_path)
+    df = generate_dataset(days=30, n_facilities=2, seed=1)
+    path = export_file(df, "parquet", columns=["date", "facility"], chunk_rows=10)
+    table = pq.read_table(path)
+    assert table.num_rows == len(df) and table.schema.field("date").type.unit in ("ns", "us")
+    export._prune(now=path.stat().st_mtime + export.EXPORT_TTL_S + 1)
+    assert not path.exists()
+
+def test_alert_report_streams_from_the_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_DIR", tmp_path)
+    df = generate_dataset(days=120, n_facilities=4, seed=3)
+    anomalies, _ = detect_anomalies(df, "billed_revenue")
+    store = AlertStore(tmp_path / "alerts.sqlite")
+    scan = store.publish(anomalies, "billed_revenue")
+    chunks = list(store.iter_query(scan, chunk_rows=5, order="Newest"))
+    assert max(len(c) for c in chunks) <= 5
+    assert pd.concat(chunks)["alert_id"].tolist() == store.query(scan, order="Newest")["alert_id"].tolist()
+    path = export_file(store.iter_query(scan, chunk_rows=5), "csv", date_format=US_DATE)
+    assert len(pd.read_csv(path)) == len(anomalies)
@@ -0,0 +1,37 @@
+import pandas as pd
+from src import incremental, model
+from src.data_gen import generate_dataset, extend_dataset
+from src.incremental import IncrementalDetector
+
+def test_update_scores_only_new_rows():
+    df = generate_dataset(days=120, n_facilities=2, seed=3)
+    det = IncrementalDetector("billed_revenue", refit_every=40)
+    _, scored = det.fit(df)
+    assert det.fit_count == 2
+
+    grown = extend_dataset(df, days=30, seed=4)
+    out, new_scored = det.update(grown)
+    assert len(new_scored) == 2 * 30
+    assert list(new_scored.columns) == list(scored.columns)
+    assert pd.to_datetime(new_scored["date"]).min() > pd.to_datetime(df["date"]).max()
+    assert set(out["date"]) <= set(new_scored["date"])
+
+    # Nothing new -> nothing scored; crossing refit_every triggers a scheduled refit
+    assert det.update(grown)[1].empty
+    det.update(extend_dataset(grown, days=30, seed=5))
+    assert det.fit_count == 4
+
+def test_fit_reuses_the_scan_forests(monkeypatch):
+    fits = []
+    def counting(X, *a, **k):
+        fits.append(len(X))
+        return real(X, *a, **k)
+    real = model._fit_forest
+    monkeypatch.setattr(model, "_fit_forest", counting)
+    monkeypatch.setattr(incremental, "_fit_forest", counting)
+    df = generate_dataset(days=90, n_facilities=3, seed=6)
+    incremental.IncrementalDetector("move_ins", train_window=365).fit(df)
+    assert fits == [90, 90, 90]  # one forest per facility
+    fits.clear()
+    incremental.IncrementalDetector("move_ins", train_window=60).fit(df)
+    assert fits == [90] * 3 + [60] * 3  # longer than train_window: refit on the trailing window
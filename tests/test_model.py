@@ -9,3 +9,134 @@ def test_detect_runs():
     assert isinstance(out, pd.DataFrame)
     assert isinstance(scored, pd.DataFrame)
     assert "anomaly_label" in scored.columns
+
+def test_executors_match_serial():
+    df = generate_dataset(days=60, n_facilities=4, seed=11)
+    base_out, base_scored = detect_anomalies(df, metric="move_ins")
+    for executor in ("thread", "process"):
+        out, scored = detect_anomalies(df, metric="move_ins", executor=executor, n_workers=2, chunk_size=1,
+                                       cache=False)
+        pd.testing.assert_frame_equal(out, base_out)
+        pd.testing.assert_frame_equal(scored, base_scored)
+
+def test_threshold_change_reuses_cached_stages(monkeypatch):
+    from src import model
+    df = generate_dataset(days=60, n_facilities=3, seed=5)
+    model.clear_stage_cache()
+    detect_anomalies(df, metric="billed_revenue", iforest_contamination=0.05, z_abs_threshold=3.0)
+    fresh_out, fresh_scored = detect_anomalies(df, metric="billed_revenue", iforest_contamination=0.02,
+                                               z_abs_threshold=2.0, cache=False)
+
+    def _boom(*args, **kwargs):
+        raise AssertionError("stage should have been served from cache")
+    monkeypatch.setattr(model, "_stl_residuals", _boom)
+    monkeypatch.setattr(model, "_model_stage", _boom)
+    out, scored = detect_anomalies(df, metric="billed_revenue", iforest_contamination=0.02, z_abs_threshold=2.0)
+    pd.testing.assert_frame_equal(out, fresh_out)
+    pd.testing.assert_frame_equal(scored, fresh_scored)
+
+def test_grouped_rolling_matches_per_facility():
+    import numpy as np
+    from src.model import _rolling_zscore
+    rng = np.random.default_rng(0)
+    a, b = rng.normal(size=40), rng.normal(size=25)
+    groups = np.repeat([0, 1], [40, 25])
+    batched = _rolling_zscore(np.r_[a, b], window=14, groups=groups)
+    np.testing.assert_array_equal(batched, np.r_[_rolling_zscore(a), _rolling_zscore(b)])
+
+def test_multi_metric_matches_single_metric_scans():
+    from src.model import detect_anomalies_multi
+    df = generate_dataset(days=80, n_facilities=2, seed=9)
+    metrics = ["billed_revenue", "move_ins"]
+    out, scored = detect_anomalies_multi(df, metrics)
+    for metric in metrics:
+        single_out, single_scored = detect_anomalies(df, metric=metric)
+        pd.testing.assert_frame_equal(scored[metric], single_scored)
+        assert (out["metric"] == metric).sum() == len(single_out)
+
+    mv_out, _ = detect_anomalies_multi(df, metrics, multivariate=True)
+    assert set(mv_out["metric"]) <= set(metrics)
+
+def test_why_text_is_built_lazily():
+    from src.model import why_text
+    df = generate_dataset(days=60, n_facilities=2, seed=4)
+    out, scored = detect_anomalies(df, metric="billed_revenue", z_abs_threshold=2.0)
+    assert "why_text" not in scored.columns
+    assert {"baseline_mean", "baseline_median"} <= set(scored.columns)
+    flagged = scored[scored["anomaly_label"] == 1]
+    assert list(why_text(flagged, "billed_revenue")) == list(
+        out.sort_values(["facility", "date"])["why_text"])
+
+def test_fast_decompositions_find_injected_spike():
+    import numpy as np
+    from src.model import _batched_residuals, _fast_residuals
+    t = np.arange(70)
+    Y = np.vstack([100 + 10 * np.sin(2 * np.pi * t / 7), 50 + 0.2 * t + 5 * np.cos(2 * np.pi * t / 7)])
+    Y[:, 30] += 40
+    for method in ("classical", "median"):
+        resid = _fast_residuals(Y, period=7, method=method)
+        assert (np.abs(resid).argmax(axis=1) == 30).all()
+        # ragged facilities go through the same batched path
+        spans = [(0, 70), (70, 140), (140, 175)]
+        flat = np.r_[Y[0], Y[1], Y[0, :35]][:, None]
+        batched = _batched_residuals(flat, spans, 7, method)[:, 0]
+        np.testing.assert_allclose(batched[70:140], resid[1])
+
+    df = generate_dataset(days=60, n_facilities=3, seed=5)
+    out, scored = detect_anomalies(df, metric="billed_revenue", decomposition="median")
+    assert len(scored) == len(df) and len(out) > 0
+
+def test_cascade_runs_full_model_only_on_suspects():
+    import numpy as np
+    df = generate_dataset(days=90, n_facilities=4, seed=3)
+    quiet = df["facility"].isin(["FAC-002", "FAC-004"])
+    t = np.arange(90)
+    df.loc[quiet, "billed_revenue"] = np.tile(10000 + 300 * np.sin(2 * np.pi * t / 7), 2).astype("float32")
+    stats = {}
+    out, scored = detect_anomalies(df, "billed_revenue", cascade=True, stats=stats, cache=False)
+    full_out, full_scored = detect_anomalies(df, "billed_revenue", cache=False)
+    assert stats == dict(facilities=4, full_model=2, clean=2)
+    assert set(out["facility"]) <= {"FAC-001", "FAC-003"} and len(scored) == len(df)
+    assert scored.loc[scored["facility"].isin(["FAC-002", "FAC-004"]), "anomaly_label"].eq(0).all()
+    suspects = ~full_scored["facility"].isin(["FAC-002", "FAC-004"])
+    pd.testing.assert_frame_equal(scored[scored["iso_decision"].notna()].reset_index(drop=True),
+                                  full_scored[suspects].reset_index(drop=True))
+
+def test_cascade_keeps_most_alerts_on_generated_data():
+    # Every generated facility has injected anomalies, so the screen should pass most
+    # of them — including low-count move-ins, where no day reaches a robust |z| of 4.5
+    df = generate_dataset(days=210, n_facilities=6, seed=42)
+    for metric in ("move_ins", "billed_revenue"):
+        stats = {}
+        out, _ = detect_anomalies(df, metric, cascade=True, stats=stats)
+        full, _ = detect_anomalies(df, metric)
+        assert stats["full_model"] >= 4
+        assert len(out) >= 0.6 * len(full)
+
+def test_pooled_mode_fits_one_forest(monkeypatch, tmp_path):
+    from src import model
+    from src.registry import ModelRegistry
+    fits, real_fit = [], model._fit_forest
+
+    def counting_fit(X, params=model.FOREST_PARAMS):
+        fits.append(len(X))
+        return real_fit(X, params)
+    monkeypatch.setattr(model, "_fit_forest", counting_fit)
+    df = generate_dataset(days=60, n_facilities=4, seed=8)
+    out, scored = detect_anomalies(df, "billed_revenue", pooled=True, cache=False)
+    assert fits == [240]
+    assert scored["confidence"].between(0, 1).all()
+    per_fac = scored.groupby("facility", observed=True)["iso_decision"]
+    assert (per_fac.min() < 0).all()  # offsets are still per facility
+
+    registry = ModelRegistry(tmp_path)
+    detect_anomalies(df, "billed_revenue", pooled=True, cache=False, registry=registry)
+    detect_anomalies(df, "billed_revenue", pooled=True, cache=False, registry=registry)
+    assert len(fits) == 2 and registry.metadata("__portfolio__", "billed_revenue") is not None
+
+    # a forest pooled over a subset is not reused for the full portfolio (nor vice versa)
+    subset = df[df["facility"].isin(["FAC-001", "FAC-002"])]
+    detect_anomalies(subset, "billed_revenue", pooled=True, cache=False, registry=registry)
+    assert fits[-1] == 120
+    detect_anomalies(df, "billed_revenue", pooled=True, cache=False, registry=registry)
+    assert fits[-1] == 240 and len(fits) == 4
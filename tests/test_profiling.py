@@ -0,0 +1,32 @@
+from src.data_gen import generate_dataset
+from src.model import detect_anomalies
+from src.profiling import add_hook, profiling, remove_hook
+
+def test_profile_covers_stages_facilities_and_cache_hits():
+    df = generate_dataset(days=120, n_facilities=3, seed=1)
+    events = []
+    hook = add_hook(events.append)
+    try:
+        with profiling("test") as prof:
+            detect_anomalies(df, "billed_revenue")
+    finally:
+        remove_hook(hook)
+    assert {"prepare", "decomposition", "rolling_z", "forest", "scoring"} <= set(prof.stages)
+    assert prof.counters["rows"] == len(df) and prof.counters["forest_fits"] == 3
+    assert len(prof.facility_seconds) == 3 and prof.slowest(1)[0][1] > 0
+    assert events[-1]["event"] == "scan" and any(e.get("stage") == "forest" for e in events)
+    # self-times never exceed the wall clock
+    assert sum(prof.stages.values()) <= prof.wall_s + 1e-6
+
+    with profiling("rerun") as again:  # same data: every stage served from cache
+        detect_anomalies(df, "billed_revenue", iforest_contamination=0.03)
+    assert again.counters.get("forest_fits", 0) == 0 and again.counters["model_cache_hits"] == 3
+
+def test_failing_hook_does_not_break_scan():
+    df = generate_dataset(days=60, n_facilities=1, seed=2)
+    hook = add_hook(lambda e: 1 / 0)
+    try:
+        anomalies, _ = detect_anomalies(df, "move_ins")
+    finally:
+        remove_hook(hook)
+    assert "priority" in anomalies.columns
@@ -0,0 +1,44 @@
+import pandas as pd
+from src import model
+from src.data_gen import generate_dataset
+from src.model import detect_anomalies
+from src.registry import ModelRegistry
+
+def test_saved_models_are_reused(tmp_path, monkeypatch):
+    df = generate_dataset(days=90, n_facilities=2, seed=2)
+    registry = ModelRegistry(tmp_path)
+    out, scored = detect_anomalies(df, metric="billed_revenue", registry=registry, cache=False)
+    meta = registry.metadata("FAC-001", "billed_revenue")
+    assert meta["window"]["rows"] == 90 and meta["params"]["stl_period"] == 7
+
+    def _boom(X):
+        raise AssertionError("should have loaded the saved model")
+    monkeypatch.setattr(model, "_fit_forest", _boom)
+    out2, scored2 = detect_anomalies(df, metric="billed_revenue", registry=registry, cache=False)
+    pd.testing.assert_frame_equal(out2, out)
+    pd.testing.assert_frame_equal(scored2, scored)
+
+def test_drifted_or_changed_params_need_refit(tmp_path):
+    import numpy as np
+    registry = ModelRegistry(tmp_path, drift_tol=0.5)
+    X = np.random.default_rng(0).normal(size=(100, 3))
+    params = dict(model.FOREST_PARAMS, stl_period=7)
+    registry.save("FAC-001", "move_ins", model._fit_forest(X), params, ["a", "b", "c"], X, ("d0", "d1"))
+    meta = registry.metadata("FAC-001", "move_ins")
+    assert registry.stale_reason(meta, params, ["a", "b", "c"], X) is None
+    assert registry.stale_reason(meta, params, ["a", "b", "c"], X + 2.0) == "drift"
+    assert registry.stale_reason(meta, params, ["a", "b", "c"], X * np.r_[3.0, 1, 1]) == "drift"
+    assert registry.stale_reason(meta, params, ["a", "b", "c"], X * 1.2) is None
+    assert registry.stale_reason(meta, dict(params, stl_period=14), ["a", "b", "c"], X) == "params"
+
+def test_noisier_data_refits(tmp_path, monkeypatch):
+    df = generate_dataset(days=120, n_facilities=3, seed=4)
+    registry = ModelRegistry(tmp_path)
+    detect_anomalies(df, metric="billed_revenue", registry=registry, cache=False)
+    fits, real_fit = [], model._fit_forest
+    monkeypatch.setattr(model, "_fit_forest", lambda X, *a: fits.append(len(X)) or real_fit(X, *a))
+    # triple every facility's deviations around its median: same mean level, 3x the spread
+    med = df.groupby("facility", observed=True)["billed_revenue"].transform("median")
+    noisy = df.assign(billed_revenue=med + 3 * (df["billed_revenue"] - med))
+    detect_anomalies(noisy, metric="billed_revenue", registry=registry, cache=False)
+    assert len(fits) == 3
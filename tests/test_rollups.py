@@ -0,0 +1,55 @@
+import pandas as pd
+from src.data_gen import extend_dataset, generate_dataset
+from src.model import detect_anomalies
+from src.rollups import PortfolioRollups
+
+def _tables(r):
+    return r.facility_daily.reset_index(drop=True), r.portfolio_daily, r.facility_totals.sort_index()
+
+def test_incremental_updates_match_a_fresh_build():
+    df = generate_dataset(days=120, n_facilities=5, seed=2)
+    out, _ = detect_anomalies(df, "move_ins")
+    live = PortfolioRollups("move_ins").update(df, "v1", out, "s1")
+
+    # new data, then a rescan with other thresholds: alerts are added and removed
+    df2 = extend_dataset(df, days=20, seed=3)
+    live.update(df2, "v2", out, "s1")
+    out2, _ = detect_anomalies(df2, "move_ins", z_abs_threshold=2.5)
+    live.update(df2, "v2", out2, "s2")
+
+    fresh = PortfolioRollups("move_ins").update(df2, "v2", out2, "s2")
+    for a, b in zip(_tables(live), _tables(fresh)):
+        pd.testing.assert_frame_equal(a, b, check_dtype=False)
+    assert live.totals()["rows"] == len(df2) and live.totals()["alerts"] == len(out2)
+
+    latest = df2["date"].max()
+    recent = out2[(out2["date"] >= latest - pd.Timedelta(days=30)) & out2["facility"].isin(["FAC-002"])]
+    by_fac = live.alerts_by_facility(30, ["FAC-002"])
+    assert by_fac["alerts"].sum() == len(recent)
+    assert by_fac["high"].sum() == (recent["priority"] == "High").sum()
+
+def test_unrelated_dataset_rebuilds():
+    r = PortfolioRollups("billed_revenue").update(generate_dataset(days=60, n_facilities=3, seed=1), "a")
+    other = generate_dataset(days=30, n_facilities=2, seed=9)
+    r.update(other, "b")
+    assert r.totals()["rows"] == len(other) and len(r.portfolio_daily) == 30
+
+def test_snapshots_are_unaffected_by_later_updates():
+    df = generate_dataset(days=90, n_facilities=4, seed=6)
+    out, _ = detect_anomalies(df, "move_ins")
+    live = PortfolioRollups("move_ins").update(df, "v1", out, "s1")
+    snap = live.snapshot()
+    before = [t.copy() for t in _tables(snap)]
+
+    df2 = extend_dataset(df, days=15, seed=7)
+    out2, _ = detect_anomalies(df2, "move_ins", z_abs_threshold=2.5)
+    live.update(df2, "v2", out2, "s2")
+    for a, b in zip(_tables(snap), before):
+        pd.testing.assert_frame_equal(a, b)
+    assert snap.totals()["alerts"] == len(out) and live.totals()["alerts"] == len(out2)
+
+    # a snapshot seeds the next version's rollups: only the new days are added
+    seeded = snap.snapshot().update(df2, "v2", out2, "s2")
+    for a, b in zip(_tables(seeded), _tables(live)):
+        pd.testing.assert_frame_equal(a, b, check_dtype=False)
+    assert snap.version == "v1"
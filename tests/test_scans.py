@@ -0,0 +1,92 @@
+import threading
+import time
+import pandas as pd
+from src.data_gen import generate_dataset
+from src.model import detect_anomalies
+from src.scans import ScanService
+from src.store import DatasetStore
+
+def test_jobs_run_in_background_with_progress_and_events():
+    svc = ScanService(n_workers=1)
+    gate = threading.Event()
+
+    def slow(progress):
+        progress(0.5, "half")
+        gate.wait(5)
+        return 42
+    job = svc.submit(slow, "slow scan", key="k", describe=lambda r: f"got {r}")
+    assert svc.submit(slow, "dup", key="k") is job  # identical work is deduped
+    while job.progress < 0.5:
+        time.sleep(0.01)
+    assert job.active and job.message == "half"
+    gate.set()
+    assert svc.wait(job.id, timeout=5).status == "done" and job.result == 42
+
+    bad = svc.submit(lambda progress: 1 / 0, "bad scan")
+    assert svc.wait(bad.id, timeout=5).status == "failed"
+    events, seq = svc.events_since(0)
+    assert [e["text"] for e in events] == ["got 42", "bad scan failed: ZeroDivisionError: division by zero"]
+    assert svc.events_since(seq) == ([], seq)
+
+    # only the newest events are kept; a session that fell behind gets what is left
+    svc.max_events = 3
+    for i in range(4):
+        svc.wait(svc.submit(lambda progress, i=i: i, f"job {i}").id, timeout=5)
+    events, seq2 = svc.events_since(seq)
+    assert seq2 == seq + 4 and [e["seq"] for e in events] == [seq + 2, seq + 3, seq + 4]
+    assert svc.events_since(seq + 3)[0][0]["seq"] == seq + 4 and len(svc._events) == 3
+
+    ticks = []
+    svc.schedule("tick", 0.05, lambda: dict(fn=lambda progress: ticks.append(1), label="tick"))
+    deadline = time.time() + 5
+    while len(ticks) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    svc.shutdown()
+    assert len(ticks) >= 2 and svc.scheduled() == []
+
+def test_chunked_background_scan_matches_single_pass(tmp_path):
+    from src.state import _compute_scan
+    store = DatasetStore(tmp_path)
+    df = generate_dataset(days=60, n_facilities=5, seed=2)
+    version = store.put(df)
+    seen = []
+    out, scored, _ = _compute_scan(store, version, None, progress=lambda f, m: seen.append(f),
+                                   metric="billed_revenue", cache=False)
+    want_out, want_scored = detect_anomalies(store.get(version), "billed_revenue", cache=False)
+    assert seen[-1] == 1.0 and len(seen) == 5
+    pd.testing.assert_frame_equal(out, want_out)
+    pd.testing.assert_frame_equal(scored, want_scored)
+
+def test_sessions_share_the_scan_schedule(tmp_path, monkeypatch):
+    # Two console sessions in one process: opening or rerunning the page must not cancel or
+    # retarget a schedule another session set.
+    from pathlib import Path
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    from src.state import scan_schedule, scan_service
+    page = str(Path(__file__).resolve().parents[1] / "pages" / "1_👷_Operator_Console.py")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(st, "page_link", lambda *a, **k: None)
+    st.cache_resource.clear()
+    try:
+        a = AppTest.from_file(page, default_timeout=120).run()
+        a.number_input(key="scan_every_min").set_value(5).run()
+        target = scan_schedule()
+        assert target["interval_min"] == 5 and "auto" in scan_service().scheduled()
+
+        b = AppTest.from_file(page, default_timeout=120).run()
+        b.run()
+        assert b.number_input(key="scan_every_min").value == 5
+        assert "auto" in scan_service().scheduled() and scan_schedule()["key"] == target["key"]
+
+        # Advance month moves the schedule on to the new version, so later ticks scan it
+        [x for x in a.button if x.label.startswith("▶️ Advance month") and x.key != "sb_demo_advance"][0].click().run()
+        moved = scan_schedule()
+        assert moved["key"][0] == a.session_state["dataset_version"] != target["key"][0]
+        assert moved["request"]["version"] == moved["key"][0] and moved["key"][1:] == target["key"][1:]
+
+        b.number_input(key="scan_every_min").set_value(0).run()
+        assert scan_schedule() == {} and "auto" not in scan_service().scheduled()
+    finally:
+        scan_service().shutdown()
+        st.cache_resource.clear()
@@ -0,0 +1,25 @@
+import pandas as pd
+import pytest
+from src.data_gen import generate_dataset, extend_dataset
+from src.schema import SchemaError, coerce_dataset
+
+def test_generated_data_uses_compact_schema():
+    df = extend_dataset(generate_dataset(days=30, n_facilities=3, seed=1), days=10, seed=2)
+    assert str(df["date"].dtype) == "datetime64[ns]"
+    assert isinstance(df["facility"].dtype, pd.CategoricalDtype)
+    assert df["billed_revenue"].dtype == "float32" and df["move_ins"].dtype == "int16"
+    assert len(df) == 3 * 40
+
+def test_coerce_converts_and_rejects_bad_rows():
+    raw = pd.DataFrame({
+        "date": ["2025-01-01", "2025-01-02"], "facility": ["FAC-002", "FAC-001"],
+        "billed_revenue": [100.0, 200.0], "payment_success_rate": [0.9, 0.95],
+        "move_ins": [1.0, 3.0], "delinquencies": [0.02, 0.03], "note": ["a", "b"],
+    })
+    df = coerce_dataset(raw)
+    assert list(df["facility"].cat.categories) == ["FAC-001", "FAC-002"]
+    assert df["move_ins"].tolist() == [1, 3] and df["note"].tolist() == ["a", "b"]
+    with pytest.raises(SchemaError):
+        coerce_dataset(raw.assign(move_ins=[1.5, 2.0]))
+    with pytest.raises(SchemaError):
+        coerce_dataset(raw.drop(columns="delinquencies"))
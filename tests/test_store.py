@@ -0,0 +1,34 @@
+import time
+import pandas as pd
+import pytest
+from src.data_gen import generate_dataset
+from src.store import DatasetStore
+
+def test_versions_are_content_addressed_and_shared(tmp_path):
+    store = DatasetStore(tmp_path)
+    df = generate_dataset(days=30, n_facilities=3, seed=1)
+    version = store.put(df)
+    assert store.put(df.copy()) == version
+    assert store.put(df.iloc[:-1]) != version
+
+    view = store.get(version)
+    pd.testing.assert_frame_equal(view, df)
+    assert store.get(version) is view                       # one frame per version per process
+    assert not view["billed_revenue"].to_numpy().flags.writeable   # zero-copy over the mapped file
+    assert set(store.select(version, ["FAC-002"])["facility"]) == {"FAC-002"}
+
+def test_old_versions_are_pruned_lru_except_pinned(tmp_path):
+    store = DatasetStore(tmp_path, keep_versions=3)
+    df = generate_dataset(days=20, n_facilities=2, seed=1)
+    base = store.pin(store.put(df))
+    versions = []
+    for n in range(1, 5):
+        time.sleep(0.01)
+        versions.append(store.put(df.iloc[:-n]))
+        if n == 2:
+            time.sleep(0.01)
+            store.get(versions[0])  # a read keeps an older version in use
+    assert {p.stem for p in tmp_path.glob("*.arrow")} == {base, versions[0], versions[2], versions[3]}
+    with pytest.raises(KeyError):
+        store.get(versions[1])
+    assert len(store.get(base)) == len(df)
@@ -0,0 +1,30 @@
+import pytest
+from src.data_gen import generate_dataset
+from src.model import clear_stage_cache, detect_anomalies
+from src.profiling import profiling
+from src.sweep import sweep
+
+# move_ins at |Z| 2.5: the cascade clears a facility that has a |rolling z| >= 2.5 row
+@pytest.mark.parametrize("metric, z_thresholds, cascade", [
+    ("billed_revenue", [3.0, 4.0], False), ("move_ins", [2.5, 3.0], True)])
+def test_sweep_matches_direct_scans_with_one_fit_per_period(metric, z_thresholds, cascade):
+    df = generate_dataset(days=120, n_facilities=3, seed=5, labels=True)
+    clear_stage_cache()
+    with profiling("sweep") as prof:
+        table = sweep(df, metric, [7, 14], [0.01, 0.03], z_thresholds, cascade=cascade)
+    assert len(table) == 8
+    if not cascade:
+        assert prof.counters["forest_fits"] == 3 * 2  # per facility, per period — not per grid point
+    for _, row in table.iterrows():
+        out, _ = detect_anomalies(df, metric, stl_period=int(row["stl_period"]),
+                                  iforest_contamination=row["contamination"], z_abs_threshold=row["z_abs_threshold"],
+                                  cascade=cascade)
+        assert row["alerts"] == len(out)
+        hits = df.merge(out[["date", "facility"]], on=["date", "facility"])["injected"].sum()
+        assert row["true_positives"] == hits
+    assert table["precision"].between(0, 1).all() and table["recall"].between(0, 1).all()
+
+def test_sweep_without_truth_reports_counts_only():
+    df = generate_dataset(days=90, n_facilities=2, seed=6)
+    table = sweep(df, "move_ins", [7], [0.02], [3.0], decomposition="classical")
+    assert table["alerts"].iloc[0] > 0 and table["precision"].isna().all()